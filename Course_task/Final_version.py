@@ -1,10 +1,31 @@
+import io
 import os
+import csv
+import argparse
+import time
+import queue
+import pstats
+import cProfile
+import functools
+import heapq
+import sqlite3
+import hashlib
+import sys
+import threading
 import requests
 import json
+from collections import Counter
+from contextlib import contextmanager, nullcontext, redirect_stdout, redirect_stderr
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from tqdm import tqdm
+import httplib2
+import google_auth_httplib2
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import MediaFileUpload, MediaUpload
 from dotenv import load_dotenv
 
 # Загрузка токенов из config.env
@@ -13,19 +34,518 @@ VK_TOKEN = os.getenv('VK_TOKEN')
 YA_TOKEN = os.getenv('YA_TOKEN')
 GOOGLE_CREDS_PATH = "credentials.json"
 
+# Адреса API (можно заменить, например, на локальные заглушки для замеров). Переменные
+# окружения действуют и в процессах массового копирования, которые импортируют модуль заново
+VK_API_URL = os.getenv('VK_API_URL', 'https://api.vk.com/method/')
+YANDEX_DISK_API_URL = os.getenv('YANDEX_DISK_API_URL', 'https://cloud-api.yandex.net/v1/disk/')
+GOOGLE_DRIVE_ROOT_URL = os.getenv('GOOGLE_DRIVE_ROOT_URL', 'https://www.googleapis.com/')
+
+# Размер блока при чтении фото из VK и размер части при загрузке на Google Drive
+# (для Google Drive должен быть кратен 256 КБ)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+GOOGLE_CHUNK_SIZE = 1024 * 1024
+
+GOOGLE_DRIVE_DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/drive/v3/rest'
+GOOGLE_FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+# Максимальное количество запросов в одном пакетном запросе Google Drive
+GOOGLE_BATCH_LIMIT = 100
+
+# Ограничения частоты запросов (запросов в секунду) по хостам
+DEFAULT_RATE_LIMITS = {'api.vk.com': 3}
+# Код ошибки VK "Too many requests per second"
+VK_TOO_MANY_REQUESTS = 6
+# Максимальное количество вызовов API в одном запросе execute
+VK_EXECUTE_LIMIT = 25
+
+# С Python 3.12 cProfile работает через sys.monitoring: один включенный профиль
+# видит все потоки, а второй одновременно включить нельзя
+PROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+# Расширения файлов для форматов перекодирования изображений
+RECOMPRESS_EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+
+# Границы интервалов гистограмм длительности этапов, в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class BackupMetrics:
+    """
+    Метрики резервного копирования: гистограммы длительности этапов, счетчики
+    (переданные байты, повторы запросов, результаты по фото) и количество
+    одновременно выполняемых операций каждого этапа.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # этап -> [количество по интервалам, сумма, количество, максимум]
+        self.counters = {}  # (имя, метки) -> значение
+        self.in_flight = {}
+        self.max_in_flight = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Замер длительности этапа name и учет его одновременных выполнений.
+        """
+        with self.lock:
+            self.in_flight[name] = self.in_flight.get(name, 0) + 1
+            self.max_in_flight[name] = max(self.max_in_flight.get(name, 0), self.in_flight[name])
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+            with self.lock:
+                self.in_flight[name] -= 1
+
+    def observe(self, name, seconds):
+        """
+        Добавление длительности этапа в гистограмму.
+        """
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0, 0.0]
+            histogram = self.histograms[name]
+            index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            histogram[3] = max(histogram[3], seconds)
+
+    def add(self, name, value=1, **labels):
+        """
+        Увеличение счетчика name с метками labels.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @staticmethod
+    def _quantile(buckets, count, q):
+        # Оценка квантиля верхней границей интервала гистограммы
+        rank, seen = q * count, 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS + (float('inf'),), buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def summary(self):
+        """
+        Сводка метрик в виде словаря для JSON.
+        """
+        with self.lock:
+            stages = {}
+            for name, (buckets, total, count, maximum) in self.histograms.items():
+                stages[name] = {
+                    'count': count,
+                    'total_seconds': round(total, 6),
+                    'mean_seconds': round(total / count, 6) if count else 0,
+                    'max_seconds': round(maximum, 6),
+                    'p50_seconds': self._quantile(buckets, count, 0.5),
+                    'p99_seconds': self._quantile(buckets, count, 0.99),
+                    'max_in_flight': self.max_in_flight.get(name, 0),
+                }
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {'stages': stages, 'counters': counters}
+
+    def to_prometheus(self):
+        """
+        Метрики в текстовом формате Prometheus.
+        """
+        def label_value(value):
+            # Экранирование по формату Prometheus: обратная косая черта, кавычка и перевод строки
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        def label_text(labels):
+            return '{' + ','.join(f'{key}="{label_value(value)}"' for key, value in labels) + '}' if labels else ''
+
+        lines = []
+        with self.lock:
+            lines.append('# TYPE backup_stage_seconds histogram')
+            for name, (buckets, total, count, _) in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                    cumulative += bucket_count
+                    lines.append(f'backup_stage_seconds_bucket{label_text((("stage", name), ("le", bound)))} '
+                                 f'{cumulative}')
+                lines.append(f'backup_stage_seconds_sum{label_text((("stage", name),))} {total}')
+                lines.append(f'backup_stage_seconds_count{label_text((("stage", name),))} {count}')
+            lines.append('# TYPE backup_stage_max_in_flight gauge')
+            for name, value in sorted(self.max_in_flight.items()):
+                lines.append(f'backup_stage_max_in_flight{label_text((("stage", name),))} {value}')
+            declared = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in declared:
+                    lines.append(f'# TYPE {name} counter')
+                    declared.add(name)
+                lines.append(f'{name}{label_text(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """
+        Запись метрик в файлы path.prom (Prometheus) и path.json (сводка).
+        """
+        # Prometheus принимает только UTF-8 и переводы строк '\n'
+        with open(f'{path}.prom', 'w', encoding='utf-8', newline='\n') as prom_file:
+            prom_file.write(self.to_prometheus())
+        with open(f'{path}.json', 'w', encoding='utf-8') as json_file:
+            json.dump(self.summary(), json_file, indent=4)
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов по алгоритму token bucket.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: Количество запросов в секунду.
+        :param capacity: Допустимый всплеск запросов (по умолчанию равен rate, но не меньше 1,
+                         иначе при rate < 1 целый токен никогда не накопится).
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Ожидание, пока не появится свободный токен.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class RateLimitedSession:
+    """
+    Общая HTTP-сессия для всех классов API.
+
+    Держит пул keep-alive соединений, ограничивает частоту запросов к каждому
+    хосту и повторяет запросы с экспоненциальной задержкой при ответе 429.
+    """
+
+    retry_statuses = (429, 503)
+
+    def __init__(self, rate_limits=None, pool_size=10, max_retries=5, backoff=0.5, metrics=None, budget=None):
+        """
+        :param rate_limits: Словарь {хост: запросов в секунду}.
+        :param pool_size: Количество соединений в пуле для каждого хоста.
+        :param max_retries: Максимальное число повторов запроса.
+        :param backoff: Начальная задержка перед повтором в секундах.
+        :param metrics: Метрики (BackupMetrics), общие для всех пользователей сессии.
+        :param budget: Общий ограничитель (TokenBucket) нескольких сессий; действует
+                       на запросы к хостам из rate_limits в дополнение к их лимитам.
+        """
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.rate_limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.metrics = metrics or BackupMetrics()
+        self.budget = budget
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """
+        Ожидание разрешения ограничителя для хоста из url.
+        """
+        host = urlsplit(url).hostname
+        if host not in self.rate_limits:
+            return
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate_limits[host])
+            bucket = self._buckets[host]
+        bucket.acquire()
+        if self.budget is not None:
+            self.budget.acquire()
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """
+        Задержка перед повтором номер attempt (с нуля).
+        """
+        if retry_after and str(retry_after).isdigit():
+            return int(retry_after)
+        return self.backoff * 2 ** attempt
+
+    def request(self, method, url, **kwargs):
+        """
+        Выполнение запроса с учетом ограничений частоты и повторов.
+
+        Запросы с телом-итератором не повторяются, так как тело уже прочитано.
+        """
+        retries = 0 if hasattr(kwargs.get('data'), '__next__') else self.max_retries
+        for attempt in range(retries + 1):
+            self.wait(url)
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code not in self.retry_statuses or attempt == retries:
+                return response
+            response.close()
+            self.metrics.add('backup_retries_total', host=urlsplit(url).hostname, reason=response.status_code)
+            time.sleep(self.backoff_delay(attempt, response.headers.get('Retry-After')))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+class VKMetadataCache:
+    """
+    Кэш ответов API VK с метаданными альбомов и фотографий в базе SQLite.
+
+    Ключ записи - метод и параметры вызова без токена, поэтому повторный
+    запуск с теми же параметрами не обращается к API, пока запись не
+    устарела. При превышении max_entries удаляются записи, к которым
+    дольше всего не обращались.
+    """
+
+    # Методы, ответы которых можно сохранять
+    CACHED_METHODS = ('photos.getAlbums', 'photos.get')
+
+    def __init__(self, path='vk_metadata_cache.db', ttl=3600, max_entries=10000):
+        """
+        :param path: Путь к файлу базы данных.
+        :param ttl: Время жизни записи в секундах.
+        :param max_entries: Максимальное количество записей.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "cache_key TEXT PRIMARY KEY, method TEXT, owner_id TEXT, response TEXT, "
+                "created REAL, accessed REAL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+
+    @staticmethod
+    def cache_key(method, params):
+        """
+        Ключ записи: метод и параметры без токена, значения приводятся к строкам.
+        """
+        params = {key: str(value) for key, value in params.items() if key != 'access_token'}
+        return method + '?' + json.dumps(params, sort_keys=True)
+
+    def get(self, method, params):
+        """
+        Поиск сохраненного ответа.
+
+        :return: Ответ API или None, если записи нет или она устарела.
+        """
+        key = self.cache_key(method, params)
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT response, created FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.connection.execute("DELETE FROM responses WHERE cache_key = ?", (key,))
+                return None
+            self.connection.execute("UPDATE responses SET accessed = ? WHERE cache_key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, method, params, response):
+        """
+        Сохранение ответа API с вытеснением давно не использованных записей.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (self.cache_key(method, params), method, str(params.get('owner_id')),
+                 json.dumps(response, ensure_ascii=False), now, now)
+            )
+            self.connection.execute(
+                "DELETE FROM responses WHERE cache_key IN ("
+                "SELECT cache_key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def invalidate(self, method=None, owner_id=None):
+        """
+        Удаление записей кэша.
+
+        :param method: Удалить только ответы этого метода.
+        :param owner_id: Удалить только ответы для этого пользователя.
+        :return: Количество удаленных записей.
+        """
+        conditions, values = [], []
+        if method is not None:
+            conditions.append("method = ?")
+            values.append(method)
+        if owner_id is not None:
+            conditions.append("owner_id = ?")
+            values.append(str(owner_id))
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        with self.lock, self.connection:
+            return self.connection.execute("DELETE FROM responses" + where, values).rowcount
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
 
 class VKPhotoBackup:
     """
     Класс для работы с API VK для резервного копирования фотографий.
     """
 
-    def __init__(self, vk_token):
+    def __init__(self, vk_token, session=None, cache=None):
         """
         Инициализация класса с токеном VK.
+
+        :param session: Общая HTTP-сессия (RateLimitedSession).
+        :param cache: Кэш метаданных (VKMetadataCache) или None.
         """
         self.vk_token = vk_token
-        self.vk_url = 'https://api.vk.com/method/'
+        self.vk_url = VK_API_URL
         self.api_version = '5.131'
+        self.session = session or RateLimitedSession()
+        self.cache = cache
+
+    def _cached(self, method, params):
+        """
+        Поиск ответа в кэше метаданных.
+
+        :return: Ответ API или None.
+        """
+        if self.cache is None or method not in self.cache.CACHED_METHODS:
+            return None
+        response = self.cache.get(method, {'v': self.api_version, **params})
+        self.session.metrics.add('backup_cache_total', result='hit' if response is not None else 'miss')
+        return response
+
+    def _store(self, method, params, response):
+        """
+        Сохранение успешного ответа в кэше метаданных.
+        """
+        if self.cache is not None and method in self.cache.CACHED_METHODS:
+            self.cache.set(method, {'v': self.api_version, **params}, response)
+
+    def _call(self, method, params):
+        """
+        Вызов метода API VK с повтором при ошибке "Too many requests per second".
+
+        :param method: Название метода, например 'photos.get'.
+        :param params: Параметры метода без токена и версии.
+        :return: Ответ API в виде словаря.
+        """
+        cached = self._cached(method, params)
+        if cached is not None:
+            return {'response': cached}
+        request_params = {'access_token': self.vk_token, 'v': self.api_version, **params}
+        for attempt in range(self.session.max_retries + 1):
+            # POST, чтобы длинный код execute не упирался в ограничение длины URL
+            with self.session.metrics.stage('vk_api'):
+                response = self.session.post(self.vk_url + method, data=request_params).json()
+            error_code = response.get('error', {}).get('error_code')
+            if error_code != VK_TOO_MANY_REQUESTS or attempt == self.session.max_retries:
+                if 'response' in response:
+                    self._store(method, params, response['response'])
+                return response
+            self.session.metrics.add('backup_retries_total', host=urlsplit(self.vk_url).hostname,
+                                     reason='vk_too_many_requests')
+            time.sleep(self.session.backoff_delay(attempt))
+
+    def execute(self, calls):
+        """
+        Выполнение нескольких вызовов API пакетами через метод execute.
+
+        В один запрос execute помещается до 25 вызовов, поэтому N вызовов
+        стоят ceil(N / 25) запросов к API. Вызовы, ответы на которые есть
+        в кэше метаданных, в запрос не попадают.
+
+        :param calls: Список пар (метод, параметры), например ('photos.get', {...}).
+        :return: Список результатов в том же порядке; None для неудачных вызовов.
+        """
+        results = [self._cached(method, params) for method, params in calls]
+        missing = [index for index, result in enumerate(results) if result is None]
+        for start in range(0, len(missing), VK_EXECUTE_LIMIT):
+            batch = missing[start:start + VK_EXECUTE_LIMIT]
+            code = 'return [' + ','.join(
+                f'API.{calls[index][0]}({json.dumps(calls[index][1])})' for index in batch) + '];'
+            response = self._call('execute', {'code': code})
+            if 'error' in response:
+                print("Error executing batch:", response['error'].get('error_msg'))
+                continue
+            # Неудачные вызовы внутри execute возвращаются как false
+            for index, item in zip(batch, response['response']):
+                if item is not False:
+                    results[index] = item
+                    self._store(*calls[index], item)
+        return results
+
+    def batch_get_albums(self, user_ids):
+        """
+        Получение альбомов нескольких пользователей VK пакетными запросами.
+
+        :param user_ids: Список ID пользователей VK.
+        :return: Словарь {ID пользователя: список альбомов}.
+        """
+        results = self.execute([('photos.getAlbums', {'owner_id': user_id}) for user_id in user_ids])
+        return {user_id: (result or {}).get('items', []) for user_id, result in zip(user_ids, results)}
+
+    def batch_get_photos(self, albums, page_size=1000):
+        """
+        Получение всех фотографий нескольких альбомов пакетными запросами.
+
+        Сначала одним пакетом запрашиваются первые страницы всех альбомов,
+        затем по известному количеству фотографий - все оставшиеся страницы.
+
+        :param albums: Список пар (ID пользователя, ID альбома).
+        :param page_size: Количество фотографий на странице (не больше 1000).
+        :return: Словарь {(ID пользователя, ID альбома): список фотографий}.
+        """
+        def page_call(owner_id, album_id, offset):
+            params = {
+                'owner_id': owner_id,
+                'album_id': album_id,
+                'extended': 1,
+                'offset': offset,
+                'count': page_size
+            }
+            return 'photos.get', params
+
+        photos = {album: [] for album in albums}
+        first_pages = self.execute([page_call(owner_id, album_id, 0) for owner_id, album_id in albums])
+        pages = []
+        for album, result in zip(albums, first_pages):
+            if result is None:
+                continue
+            photos[album].extend(result.get('items', []))
+            for offset in range(page_size, result.get('count', 0), page_size):
+                pages.append((album, offset))
+        results = self.execute([page_call(*album, offset) for album, offset in pages])
+        for (album, offset), result in zip(pages, results):
+            if result is not None:
+                photos[album].extend(result.get('items', []))
+        return photos
 
     def get_albums(self, user_id):
         """
@@ -34,12 +554,7 @@ class VKPhotoBackup:
         :param user_id: ID пользователя VK.
         :return: Список альбомов пользователя.
         """
-        params = {
-            'access_token': self.vk_token,
-            'v': self.api_version,
-            'owner_id': user_id
-        }
-        response = requests.get(self.vk_url + 'photos.getAlbums', params=params).json()
+        response = self._call('photos.getAlbums', {'owner_id': user_id})
         albums = response.get('response', {}).get('items', [])
         if not albums:
             print("Error fetching albums:", response.get('error', {}).get('error_msg'))
@@ -48,37 +563,111 @@ class VKPhotoBackup:
                 print(f"- {album['title']} (ID: {album['id']})")
         return albums
 
+    def iter_photos(self, user_id, album_id, page_size=1000):
+        """
+        Постраничный обход всех фотографий альбома пользователя VK.
+
+        VK отдает не более 1000 фотографий за запрос, поэтому альбом читается
+        страницами через offset. Следующая страница запрашивается в фоне,
+        пока обрабатывается текущая.
+
+        :param user_id: ID пользователя VK.
+        :param album_id: ID альбома.
+        :param page_size: Количество фотографий в одном запросе (не больше 1000).
+        :return: Генератор фотографий альбома.
+        """
+        def fetch_page(offset):
+            params = {
+                'owner_id': user_id,
+                'album_id': album_id,
+                'extended': 1,
+                'offset': offset,
+                'count': page_size
+            }
+            return self._call('photos.get', params)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            offset = 0
+            next_page = executor.submit(fetch_page, offset)
+            while next_page is not None:
+                response = next_page.result()
+                if 'error' in response:
+                    print("Error fetching photos:", response['error'].get('error_msg'))
+                    return
+                items = response.get('response', {}).get('items', [])
+                total = response.get('response', {}).get('count', 0)
+                offset += len(items)
+                next_page = executor.submit(fetch_page, offset) if items and offset < total else None
+                yield from items
+
     def get_photos(self, user_id, album_id, count=5):
         """
-        Получение фотографий из альбома пользователя VK.
+        Получение самых больших фотографий из альбома пользователя VK.
+
+        Просматривается весь альбом, при этом в памяти хранится не больше
+        count фотографий.
 
         :param user_id: ID пользователя VK.
         :param album_id: ID альбома.
         :param count: Количество фотографий для загрузки.
         :return: Отсортированный список фотографий.
         """
-        params = {
-            'access_token': self.vk_token,
-            'v': self.api_version,
-            'owner_id': user_id,
-            'album_id': album_id,
-            'extended': 1,
-            'count': count
-        }
-        response = requests.get(self.vk_url + 'photos.get', params=params).json()
-        photos = response.get('response', {}).get('items', [])
-        return sorted(photos, key=lambda x: x['sizes'][-1]['width'] * x['sizes'][-1]['height'], reverse=True)[:count]
+        return heapq.nlargest(count, self.iter_photos(user_id, album_id),
+                              key=lambda x: x['sizes'][-1]['width'] * x['sizes'][-1]['height'])
+
+
+class StorageBackend:
+    """
+    Общий интерфейс хранилищ для резервного копирования.
+    """
+
+    name = None  # Краткое имя хранилища для журнала и метаданных
+    title = None  # Название для вывода пользователю
+    unique_names = True  # Нужно ли делать имена файлов в папке уникальными
+
+    def prepare_folder(self, folder_name):
+        """
+        Подготовка папки для загрузки.
+
+        :param folder_name: Название папки.
+        :return: Обозначение папки для upload_stream или None при ошибке.
+        """
+        raise NotImplementedError
+
+    def upload_stream(self, chunks, file_name, folder, size=None):
+        """
+        Потоковая загрузка файла в папку хранилища.
+
+        :param chunks: Итератор блоков байтов с содержимым файла.
+        :param file_name: Имя файла в хранилище.
+        :param folder: Обозначение папки, полученное из prepare_folder.
+        :param size: Размер файла в байтах, если известен.
+        """
+        raise NotImplementedError
 
+    def transfer_url(self, url, file_name, folder):
+        """
+        Загрузка файла по ссылке силами самого хранилища.
+
+        :return: True при успехе; False, если хранилище это не поддерживает
+                 или загрузка не удалась.
+        """
+        return False
 
-class YandexDiskUploader:
+
+class YandexDiskUploader(StorageBackend):
     """
     Класс для загрузки файлов на Яндекс.Диск.
     """
 
-    def __init__(self, ya_token):
+    name = 'yandex'
+    title = 'Yandex.Disk'
+
+    def __init__(self, ya_token, session=None):
 
         self.ya_token = ya_token
-        self.base_url = 'https://cloud-api.yandex.net/v1/disk/'
+        self.base_url = YANDEX_DISK_API_URL
+        self.session = session or RateLimitedSession()
 
     def create_folder(self, folder_name):
         """
@@ -88,7 +677,7 @@ class YandexDiskUploader:
         """
         headers = {'Authorization': f'OAuth {self.ya_token}'}
         params = {'path': folder_name}
-        response = requests.put(self.base_url + 'resources', headers=headers, params=params)
+        response = self.session.put(self.base_url + 'resources', headers=headers, params=params)
         if response.status_code == 409:
             print(f"Folder '{folder_name}' already exists on Yandex Disk.")
         elif response.status_code == 201:
@@ -96,6 +685,13 @@ class YandexDiskUploader:
         else:
             print(f"Error: {response.json()}")
 
+    def prepare_folder(self, folder_name):
+        # Вложенная папка вида 'A/B' создается по уровням: Диск не создает родительские папки сам
+        parts = folder_name.split('/')
+        for depth in range(1, len(parts) + 1):
+            self.create_folder('/'.join(parts[:depth]))
+        return folder_name
+
     def upload_file(self, file_path, file_name, folder_name):
         """
         Загрузка файла на Яндекс.Диск.
@@ -107,22 +703,255 @@ class YandexDiskUploader:
         headers = {'Authorization': f'OAuth {self.ya_token}'}
         upload_url = f"{self.base_url}resources/upload"
         params = {'path': f"{folder_name}/{file_name}", 'overwrite': 'true'}
-        response = requests.get(upload_url, headers=headers, params=params).json()
+        response = self.session.get(upload_url, headers=headers, params=params).json()
         with open(file_path, 'rb') as file:
-            requests.put(response['href'], files={'file': file})
+            self.session.put(response['href'], files={'file': file})
+
+    def upload_stream(self, chunks, file_name, folder_name, size=None):
+        """
+        Потоковая загрузка файла на Яндекс.Диск без сохранения на локальный диск.
+
+        :param chunks: Итератор блоков байтов с содержимым файла.
+        :param file_name: Имя файла на Диске.
+        :param folder_name: Папка на Яндекс.Диске.
+        :param size: Размер файла в байтах (не используется).
+        """
+        headers = {'Authorization': f'OAuth {self.ya_token}'}
+        upload_url = f"{self.base_url}resources/upload"
+        params = {'path': f"{folder_name}/{file_name}", 'overwrite': 'true'}
+        with self.session.metrics.stage('yandex_upload_href'):
+            response = self.session.get(upload_url, headers=headers, params=params).json()
+        with self.session.metrics.stage('yandex_put'):
+            self.session.put(response['href'], data=chunks).raise_for_status()
+
+    def upload_from_url(self, url, file_name, folder_name):
+        """
+        Загрузка файла на Яндекс.Диск по ссылке: файл скачивает сам Яндекс.
+
+        :param url: Ссылка на файл.
+        :param file_name: Имя файла на Диске.
+        :param folder_name: Папка на Яндекс.Диске.
+        :return: Ссылка на асинхронную операцию загрузки.
+        """
+        headers = {'Authorization': f'OAuth {self.ya_token}'}
+        upload_url = f"{self.base_url}resources/upload"
+        params = {'path': f"{folder_name}/{file_name}", 'url': url}
+        with self.session.metrics.stage('yandex_upload_from_url'):
+            response = self.session.post(upload_url, headers=headers, params=params)
+        response.raise_for_status()
+        return response.json()['href']
+
+    def wait_operation(self, operation_href, poll_interval=1.0, timeout=300):
+        """
+        Ожидание завершения асинхронной операции Яндекс.Диска.
+
+        :param operation_href: Ссылка на операцию.
+        :param poll_interval: Интервал между проверками статуса в секундах.
+        :param timeout: Максимальное время ожидания в секундах.
+        :return: True, если операция завершилась успешно.
+        """
+        headers = {'Authorization': f'OAuth {self.ya_token}'}
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.session.get(operation_href, headers=headers).json().get('status')
+            if status != 'in-progress':
+                return status == 'success'
+            time.sleep(poll_interval)
+        return False
+
+    def transfer_url(self, url, file_name, folder_name):
+        try:
+            operation_href = self.upload_from_url(url, file_name, folder_name)
+            with self.session.metrics.stage('yandex_operation'):
+                succeeded = self.wait_operation(operation_href)
+            if succeeded:
+                return True
+            error = "operation failed"
+        except (requests.RequestException, KeyError, ValueError) as exc:
+            error = exc
+        print(f"Server-side upload of {file_name} failed, uploading through this host: {error}")
+        return False
+
+
+class _ChunkedStreamMedia(MediaUpload):
+    """
+    Источник данных для resumable-загрузки на Google Drive из итератора блоков.
+
+    В памяти хранится только текущая часть (и блок, прочитанный наперед),
+    поэтому расход памяти не зависит от размера файла.
+    """
+
+    def __init__(self, chunks, size=None, mimetype='image/jpeg', chunksize=GOOGLE_CHUNK_SIZE):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._size = size
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._buffer = bytearray()
+        self._offset = 0
+        self._next_begin = 0
+        self._eof = False
+
+    def _fill(self, end):
+        while not self._eof and self._offset + len(self._buffer) < end:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                self._eof = True
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        # Читаем наперед, чтобы последняя часть ушла с известным общим размером
+        if self._size is None:
+            self._fill(self._next_begin + self._chunksize + 1)
+            if self._eof:
+                self._size = self._offset + len(self._buffer)
+        return self._size
+
+    def resumable(self):
+        return True
+
+    def getbytes(self, begin, length):
+        if begin < self._offset:
+            raise ValueError("Stream position is behind the buffered data")
+        del self._buffer[:begin - self._offset]
+        self._offset = begin
+        self._fill(begin + length)
+        data = bytes(self._buffer[:length])
+        self._next_begin = begin + len(data)
+        return data
+
+    def has_stream(self):
+        return False
 
 
-class GoogleDriveUploader:
+@functools.lru_cache(maxsize=None)
+def _drive_discovery_document():
+    """
+    Документ discovery для Google Drive API, загружаемый один раз на процесс.
+    """
+    return get_static_doc('drive', 'v3') or requests.get(GOOGLE_DRIVE_DISCOVERY_URL).text
+
+
+_drive_services = {}
+_drive_services_lock = threading.Lock()
+
+
+def _drive_service(credentials_path):
+    """
+    Учетные данные и сервис Google Drive, общие для всех загрузчиков процесса.
+
+    :param credentials_path: Путь к учетным данным Google.
+    :return: Пара (credentials, service).
+    """
+    key = (credentials_path, GOOGLE_DRIVE_ROOT_URL)
+    with _drive_services_lock:
+        if key not in _drive_services:
+            creds = service_account.Credentials.from_service_account_file(
+                credentials_path, scopes=["https://www.googleapis.com/auth/drive"]
+            )
+            document = json.loads(_drive_discovery_document())
+            document['rootUrl'] = GOOGLE_DRIVE_ROOT_URL
+            service = build_from_document(document, credentials=creds)
+            _drive_services[key] = (creds, service)
+        return _drive_services[key]
+
+
+class GoogleDriveUploader(StorageBackend):
     """
     Класс для загрузки файлов на Google Drive.
+
+    Сервис создается один раз на процесс, а каждый поток использует свой
+    HTTP-объект, поэтому загрузчик можно вызывать из нескольких потоков.
     """
 
-    def __init__(self, credentials_path):
+    name = 'google'
+    title = 'Google Drive'
+    unique_names = False
 
-        creds = service_account.Credentials.from_service_account_file(
-            credentials_path, scopes=["https://www.googleapis.com/auth/drive"]
-        )
-        self.service = build('drive', 'v3', credentials=creds)
+    def __init__(self, credentials_path, chunk_size=GOOGLE_CHUNK_SIZE, metrics=None):
+        """
+        :param credentials_path: Путь к учетным данным Google.
+        :param chunk_size: Размер части resumable-загрузки (кратен 256 КБ).
+        :param metrics: Метрики (BackupMetrics).
+        """
+        self.credentials, self.service = _drive_service(credentials_path)
+        self.chunk_size = chunk_size
+        self.metrics = metrics or BackupMetrics()
+        self._local = threading.local()
+
+    def _http(self):
+        """
+        HTTP-объект текущего потока (httplib2 не потокобезопасен).
+        """
+        if not hasattr(self._local, 'http'):
+            self._local.http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+        return self._local.http
+
+    def ensure_folders(self, folder_names, parent_id=None):
+        """
+        Поиск папок по именам и создание отсутствующих пакетными запросами.
+
+        :param folder_names: Список названий папок.
+        :param parent_id: ID родительской папки (None - корень Диска).
+        :return: Словарь {название папки: ID папки}.
+        """
+        folder_ids = {}
+        lookup_names = list(dict.fromkeys(folder_names))
+
+        def run_batch(names, make_request, callback):
+            for start in range(0, len(names), GOOGLE_BATCH_LIMIT):
+                batch = self.service.new_batch_http_request(callback=callback)
+                for index in range(start, min(start + GOOGLE_BATCH_LIMIT, len(names))):
+                    batch.add(make_request(names[index]), request_id=str(index))
+                batch.execute(http=self._http())
+
+        def lookup(name):
+            escaped_name = name.replace('\\', '\\\\').replace("'", "\\'")
+            query = f"name = '{escaped_name}' and mimeType = '{GOOGLE_FOLDER_MIME_TYPE}' and trashed = false"
+            if parent_id:
+                query += f" and '{parent_id}' in parents"
+            return self.service.files().list(q=query, fields='files(id)', pageSize=1)
+
+        def found(request_id, response, exception):
+            if exception is None and response.get('files'):
+                folder_ids[lookup_names[int(request_id)]] = response['files'][0]['id']
+
+        with self.metrics.stage('google_folder_batch'):
+            run_batch(lookup_names, lookup, found)
+        create_names = [name for name in lookup_names if name not in folder_ids]
+
+        def create(name):
+            body = {'name': name, 'mimeType': GOOGLE_FOLDER_MIME_TYPE}
+            if parent_id:
+                body['parents'] = [parent_id]
+            return self.service.files().create(body=body, fields='id')
+
+        def created(request_id, response, exception):
+            name = create_names[int(request_id)]
+            if exception is None:
+                folder_ids[name] = response['id']
+                print(f"Folder '{name}' created on Google Drive.")
+            else:
+                print(f"Error creating folder '{name}': {exception}")
+
+        with self.metrics.stage('google_folder_batch'):
+            run_batch(create_names, create, created)
+        return folder_ids
+
+    def prepare_folder(self, folder_name):
+        # Вложенная папка вида 'A/B' ищется и создается по уровням
+        folder_id = None
+        for part in folder_name.split('/'):
+            folder_id = self.ensure_folders([part], folder_id).get(part)
+            if folder_id is None:
+                return None
+        return folder_id
 
     def upload_file(self, file_path, file_name, folder_id):
         """
@@ -136,97 +965,865 @@ class GoogleDriveUploader:
             'name': file_name,
             'parents': [folder_id]
         }
-        media = MediaFileUpload(file_path, resumable=True)
+        media = MediaFileUpload(file_path, chunksize=self.chunk_size, resumable=True)
         uploaded_file = self.service.files().create(
             body=file_metadata,
             media_body=media,
             fields='id'
-        ).execute()
+        ).execute(http=self._http())
         print(f"File {file_name} uploaded to Google Drive with ID {uploaded_file.get('id')}")
 
+    def upload_files(self, files, folder_id, workers=4):
+        """
+        Параллельная загрузка нескольких файлов на Google Drive.
+
+        :param files: Список пар (локальный путь, имя файла на Google Drive).
+        :param folder_id: ID папки на Google Drive.
+        :param workers: Количество одновременных загрузок.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(self.upload_file, file_path, file_name, folder_id)
+                       for file_path, file_name in files]
+            for future in futures:
+                future.result()
+
+    def upload_stream(self, chunks, file_name, folder_id, size=None):
+        """
+        Потоковая загрузка файла на Google Drive без сохранения на локальный диск.
+
+        :param chunks: Итератор блоков байтов с содержимым файла.
+        :param file_name: Имя файла на Google Drive.
+        :param folder_id: ID папки на Google Drive.
+        :param size: Размер файла в байтах, если известен.
+        """
+        file_metadata = {
+            'name': file_name,
+            'parents': [folder_id]
+        }
+        media = _ChunkedStreamMedia(chunks, size=size, chunksize=self.chunk_size)
+        with self.metrics.stage('google_upload'):
+            uploaded_file = self.service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields='id'
+            ).execute(http=self._http())
+        print(f"File {file_name} uploaded to Google Drive with ID {uploaded_file.get('id')}")
+
+
+class BackupManifest:
+    """
+    Журнал уже сохраненных фотографий в базе SQLite.
+
+    Запись добавляется сразу после загрузки каждой фотографии, поэтому
+    прерванное копирование можно продолжить, а повторный запуск загружает
+    только новые фотографии.
+    """
+
+    def __init__(self, path='photo_backup_manifest.db'):
+        """
+        :param path: Путь к файлу базы данных.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self._hash_locks = {}
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS photos ("
+                "photo_key TEXT, destination TEXT, file_name TEXT, size_type TEXT, "
+                "sha256 TEXT, bytes INTEGER, PRIMARY KEY (photo_key, destination))"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS photos_sha256 ON photos (destination, sha256)"
+            )
+
+    @staticmethod
+    def photo_key(photo, size):
+        """
+        Ключ фотографии: ID владельца и фото, тип выбранного размера и дата.
+        """
+        return f"{photo.get('owner_id')}_{photo['id']}:{size['type']}:{photo.get('date')}"
+
+    def get(self, photo_key, destination):
+        """
+        Поиск сохраненной фотографии.
+
+        :return: Словарь с полями записи или None, если фото еще не сохранялось.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT file_name, size_type, sha256, bytes FROM photos WHERE photo_key = ? AND destination = ?",
+                (photo_key, destination)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('file_name', 'size_type', 'sha256', 'bytes'), row))
+
+    def find_by_hash(self, destination, sha256):
+        """
+        Поиск уже загруженного файла с тем же содержимым.
+
+        :return: Имя файла в хранилище или None.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT file_name FROM photos WHERE destination = ? AND sha256 = ? LIMIT 1",
+                (destination, sha256)
+            ).fetchone()
+        return row[0] if row else None
+
+    def hash_lock(self, sha256):
+        """
+        Блокировка для содержимого с данным хешем, чтобы параллельные потоки
+        не загружали один и тот же файл одновременно.
+        """
+        with self.lock:
+            return self._hash_locks.setdefault(sha256, threading.Lock())
+
+    def record(self, photo_key, destination, file_name, size_type, sha256, size_bytes):
+        """
+        Сохранение записи о загруженной фотографии.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO photos VALUES (?, ?, ?, ?, ?, ?)",
+                (photo_key, destination, file_name, size_type, sha256, size_bytes)
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+class MetadataWriter:
+    """
+    Потоковая запись метаданных о фотографиях в файл JSONL.
+
+    Каждая запись дописывается сразу после обработки фото, а файл сбрасывается
+    на диск пачками, поэтому память не растет с размером альбома, а при сбое
+    сохраняются данные об уже обработанных фото.
+    """
+
+    def __init__(self, path='photo_backup_metadata.jsonl', flush_every=50):
+        """
+        :param path: Путь к файлу JSONL.
+        :param flush_every: Через сколько записей сбрасывать файл на диск.
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        """
+        Добавление записи о фото.
+        """
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self.file.flush()
+                self.pending = 0
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def export_metadata_json(jsonl_path, json_path='photo_backup_metadata.json'):
+    """
+    Преобразование JSONL с метаданными в прежний формат JSON: список
+    записей {"file_name", "size"} в порядке фото в альбоме. Записи JSONL идут
+    в порядке завершения, поэтому в памяти сортируются только имя, размер и номер фото.
+
+    :param jsonl_path: Путь к файлу JSONL.
+    :param json_path: Путь к итоговому файлу JSON.
+    """
+    entries = []
+    with open(jsonl_path, encoding='utf-8') as source:
+        for position, line in enumerate(source):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            entries.append((record.get('index', position), record['file_name'], record['size']))
+    entries.sort(key=lambda entry: entry[0])
+    with open(json_path, 'w') as json_file:
+        json_file.write('[')
+        separator = '\n'
+        for _, file_name, size in entries:
+            json_file.write(separator + json.dumps({"file_name": file_name, "size": size}))
+            separator = ',\n'
+        json_file.write('\n]\n')
+
+
+def _photo_file_names(photos, unique=True):
+    """
+    Подбор имен файлов по количеству лайков.
+
+    :param photos: Список фотографий VK.
+    :param unique: Добавлять суффикс (N) к повторяющимся именам.
+    :return: Список имен файлов в том же порядке, что и фотографии.
+    """
+    file_name_count = {}
+    file_names = []
+    for photo in photos:
+        likes = photo['likes']['count']
+        if not unique:
+            file_names.append(f"{likes}.jpg")
+            continue
+        if likes not in file_name_count:
+            file_name_count[likes] = 0
+        file_name_count[likes] += 1
+        if file_name_count[likes] == 1:
+            file_names.append(f"{likes}.jpg")
+        else:
+            file_names.append(f"{likes}({file_name_count[likes] - 1}).jpg")
+    return file_names
+
+
+def recompress_image(data, image_format='JPEG', quality=85, max_dimension=None):
+    """
+    Перекодирование изображения с уменьшением размера файла.
+
+    Выполняется в пуле процессов, поэтому не занимает GIL сетевых потоков.
+    Требует Pillow.
+
+    :param data: Исходное изображение в байтах.
+    :param image_format: Формат результата: 'JPEG' (прогрессивный) или 'WEBP'.
+    :param quality: Качество сжатия (1-100).
+    :param max_dimension: Максимальная ширина и высота; большие изображения уменьшаются.
+    :return: Перекодированное изображение в байтах.
+    """
+    image_format = image_format.upper()
+    if image_format not in RECOMPRESS_EXTENSIONS:
+        raise ValueError(f"Unsupported recompression format: {image_format}")
+
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        if max_dimension:
+            image.thumbnail((max_dimension, max_dimension))
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        options = {'quality': quality}
+        if image_format == 'JPEG':
+            options.update(progressive=True, optimize=True)
+        result = io.BytesIO()
+        image.save(result, format=image_format, **options)
+    return result.getvalue()
+
+
+def _hashed_chunks(chunks, digest, counter):
+    """
+    Передача блоков дальше с подсчетом хеша и количества байтов.
+    """
+    for chunk in chunks:
+        digest.update(chunk)
+        counter[0] += len(chunk)
+        yield chunk
+
+
+class _ChunkFanOut:
+    """
+    Раздача блоков одного скачивания нескольким одновременным загрузкам.
+
+    У каждой загрузки своя ограниченная очередь, поэтому в памяти находится
+    не больше maxsize блоков на хранилище. Загрузка, которая завершилась
+    с ошибкой, отключается и не задерживает остальные. Ошибка скачивания
+    сохраняется в error, и загрузки получают ее при чтении блоков.
+    """
+
+    _end = object()
+
+    def __init__(self, count, maxsize=8):
+        self.queues = [queue.Queue(maxsize) for _ in range(count)]
+        self.closed = [False] * count
+        self.error = None
+
+    def consumer(self, index):
+        """
+        Итератор блоков для загрузки с номером index.
+        """
+        while True:
+            chunk = self.queues[index].get()
+            if chunk is self._end:
+                if self.error is not None:
+                    raise IOError(f"Download failed: {self.error}")
+                return
+            yield chunk
+
+    def close(self, index):
+        """
+        Отключение загрузки с номером index.
+        """
+        self.closed[index] = True
+
+    def _put(self, index, item):
+        while not self.closed[index]:
+            try:
+                self.queues[index].put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def feed(self, chunks):
+        """
+        Чтение скачиваемых блоков и раздача их всем загрузкам.
+        """
+        try:
+            for chunk in chunks:
+                for index in range(len(self.queues)):
+                    self._put(index, chunk)
+        except Exception as error:
+            self.error = error
+        finally:
+            for index in range(len(self.queues)):
+                self._put(index, self._end)
+
+
+def _run_upload(target, upload):
+    """
+    Загрузка в одно хранилище с перехватом ошибки.
+
+    :return: Текст ошибки или None при успехе.
+    """
+    try:
+        upload()
+    except Exception as error:
+        print(f"Upload of {target['file_name']} to {target['backend'].title} failed: {error}")
+        return str(error)
+    return None
+
+
+def _backup_photo(session, photo, targets, upload_executor, manifest=None, dedup=False, server_side=False,
+                  recompress=None, transform_executor=None):
+    """
+    Передача одной фотографии из VK во все выбранные хранилища.
+
+    Фото скачивается из VK один раз, а блоки ответа одновременно передаются
+    во все хранилища без записи на локальный диск. При включенной проверке
+    дубликатов или перекодировании фото сначала читается в память целиком.
+
+    :param session: Общая HTTP-сессия.
+    :param photo: Фотография VK.
+    :param targets: Список словарей с ключами backend, folder, destination и file_name.
+    :param upload_executor: Пул потоков для одновременной загрузки в хранилища.
+    :param manifest: Журнал сохраненных фотографий (BackupManifest).
+    :param dedup: Не загружать фото, содержимое которого уже есть в хранилище.
+    :param server_side: Сначала пробовать загрузку по ссылке силами хранилища.
+    :param recompress: Параметры recompress_image (None - загружать фото без изменений).
+    :param transform_executor: Пул процессов для перекодирования.
+    :return: Запись метаданных о фотографии.
+    """
+    metrics = session.metrics
+    with metrics.stage('photo'):
+        max_size_photo = max(photo['sizes'], key=lambda size: size['width'] * size['height'])
+        photo_key = BackupManifest.photo_key(photo, max_size_photo)
+        results = {}
+        pending = []
+        photo_bytes = []
+        original_bytes = None
+
+        def done(target, status, file_name=None, sha256=None, size_bytes=None, error=None):
+            file_name = file_name or target['file_name']
+            if size_bytes:
+                photo_bytes.append(size_bytes)
+            if error is None and status != 'skipped' and manifest is not None:
+                manifest.record(photo_key, target['destination'], file_name, max_size_photo['type'],
+                                sha256, size_bytes)
+            results[target['destination']] = {"file_name": file_name, "path": f"{target['folder']}/{file_name}",
+                                              "status": status}
+            metrics.add('backup_photos_total', destination=target['destination'], status=status)
+            if status in ('uploaded', 'server-side') and size_bytes:
+                metrics.add('backup_bytes_total', size_bytes, direction='upload',
+                            destination=target['destination'])
+            if error is not None:
+                results[target['destination']]["error"] = error
+
+        for target in targets:
+            saved = manifest.get(photo_key, target['destination']) if manifest is not None else None
+            if saved is not None:
+                done(target, 'skipped', saved['file_name'], size_bytes=saved['bytes'])
+            elif server_side and target['backend'].transfer_url(max_size_photo['url'], target['file_name'],
+                                                                 target['folder']):
+                done(target, 'server-side')
+            else:
+                pending.append(target)
+
+        if pending:
+            try:
+                with metrics.stage('vk_download_headers'):
+                    response = session.get(max_size_photo['url'], stream=True)
+                response.raise_for_status()
+            except requests.RequestException as error:
+                print(f"Download of photo {photo['id']} failed: {error}")
+                for target in pending:
+                    done(target, 'failed', error=str(error))
+                pending = []
+
+        if pending:
+            with response:
+                use_dedup = dedup and manifest is not None
+                if use_dedup or recompress:
+                    with metrics.stage('vk_download'):
+                        content = response.content
+                    metrics.add('backup_bytes_total', len(content), direction='download')
+                    original_bytes = len(content)
+                    extension = None
+                    if recompress:
+                        try:
+                            with metrics.stage('recompress'):
+                                recompressed = transform_executor.submit(recompress_image, content,
+                                                                         **recompress).result()
+                            if len(recompressed) < len(content):
+                                content = recompressed
+                                extension = RECOMPRESS_EXTENSIONS.get(recompress.get('image_format', 'JPEG').upper())
+                        except Exception as error:
+                            print(f"Recompression of photo {photo['id']} failed, uploading the original: {error}")
+                        metrics.add('backup_bytes_saved_total', original_bytes - len(content))
+                    sha256 = hashlib.sha256(content).hexdigest()
+
+                    def upload_buffered(target):
+                        file_name = target['file_name']
+                        if extension:
+                            file_name = os.path.splitext(file_name)[0] + extension
+                        with manifest.hash_lock(sha256) if use_dedup else nullcontext():
+                            duplicate = manifest.find_by_hash(target['destination'], sha256) if use_dedup else None
+                            if duplicate is not None:
+                                done(target, 'duplicate', duplicate, sha256, len(content))
+                                return
+                            error = _run_upload(target, lambda: target['backend'].upload_stream(
+                                iter([content]), file_name, target['folder'], len(content)))
+                            done(target, 'failed' if error else 'uploaded', file_name, sha256, len(content), error)
+
+                    for future in [upload_executor.submit(upload_buffered, target) for target in pending]:
+                        future.result()
+                else:
+                    content_length = response.headers.get('Content-Length')
+                    size = int(content_length) if content_length else None
+                    digest, counter = hashlib.sha256(), [0]
+                    chunks = _hashed_chunks(response.iter_content(DOWNLOAD_CHUNK_SIZE), digest, counter)
+                    if len(pending) == 1:
+                        target = pending[0]
+                        errors = [_run_upload(target, lambda: target['backend'].upload_stream(
+                            chunks, target['file_name'], target['folder'], size))]
+                    else:
+                        fan_out = _ChunkFanOut(len(pending))
+
+                        def upload_part(index, target):
+                            try:
+                                return _run_upload(target, lambda: target['backend'].upload_stream(
+                                    fan_out.consumer(index), target['file_name'], target['folder'], size))
+                            finally:
+                                fan_out.close(index)
+
+                        futures = [upload_executor.submit(upload_part, index, target)
+                                   for index, target in enumerate(pending)]
+                        fan_out.feed(chunks)
+                        errors = [future.result() for future in futures]
+                        if fan_out.error is not None:
+                            # Обрыв скачивания: ни одна из загрузок не получила фото целиком
+                            print(f"Download of photo {photo['id']} failed: {fan_out.error}")
+                            errors = [error or str(fan_out.error) for error in errors]
+                    metrics.add('backup_bytes_total', counter[0], direction='download')
+                    for target, error in zip(pending, errors):
+                        done(target, 'failed' if error else 'uploaded', None,
+                             digest.hexdigest(), counter[0], error)
+
+        first = results[targets[0]['destination']]
+        record = {
+            "file_name": first['file_name'],
+            "size": max_size_photo['type'],
+            "vk_id": f"{photo.get('owner_id')}_{photo['id']}",
+            "width": max_size_photo['width'],
+            "height": max_size_photo['height'],
+            "bytes": max(photo_bytes) if photo_bytes else None,
+            "destinations": results,
+        }
+        if original_bytes is not None and recompress:
+            record["original_bytes"] = original_bytes
+            record["bytes_saved"] = original_bytes - record["bytes"]
+        return record
+
+
+def _storage_backends(storage_option, ya_token, google_creds_path, session):
+    """
+    Создание хранилищ по выбору пользователя.
+
+    :param storage_option: 'yandex', 'google', 'both' или список таких названий.
+    :return: Список хранилищ (StorageBackend).
+    """
+    if storage_option == 'both':
+        storage_option = ['yandex', 'google']
+    elif isinstance(storage_option, str):
+        storage_option = [storage_option]
+    backends = []
+    for option in storage_option:
+        if option == 'yandex':
+            backends.append(YandexDiskUploader(ya_token, session))
+        elif option == 'google':
+            backends.append(GoogleDriveUploader(google_creds_path, metrics=session.metrics))
+        else:
+            print(f"Unknown storage option: {option}")
+    return backends
+
 
 def backup_vk_photos(user_id, vk_token, ya_token, google_creds_path, storage_option, album_id, count=5,
-                     folder_name='VK_Photos_Backup', google_folder_id=None):
+                     folder_name='VK_Photos_Backup', google_folder_id=None, workers=4, session=None,
+                     manifest_path='photo_backup_manifest.db', dedup=False, server_side=False,
+                     metrics_path='photo_backup_metrics', profile_path=None,
+                     metadata_path='photo_backup_metadata.jsonl', export_json=True, recompress=None,
+                     cache_path='vk_metadata_cache.db', cache_ttl=3600):
     """
-    Основная функция резервного копирования фотографий из VK на выбранный диск.
+    Основная функция резервного копирования фотографий из VK на выбранные диски.
+
+    Фотографии обрабатываются параллельно: пока одни потоки скачивают фото из VK,
+    другие загружают уже скачанные в хранилища. Каждое фото скачивается один раз
+    и одновременно загружается во все выбранные хранилища. Фото, уже записанные
+    в журнал manifest_path, пропускаются, поэтому повторный запуск загружает только новые.
 
     :param user_id: ID пользователя VK.
     :param vk_token: Токен VK.
     :param ya_token: Токен Яндекс.Диска.
     :param google_creds_path: Путь к учетным данным Google.
-    :param storage_option: Выбор хранилища ('yandex' или 'google').
+    :param storage_option: Выбор хранилища ('yandex', 'google', 'both' или список).
     :param album_id: ID альбома.
     :param count: Количество фотографий.
-    :param folder_name: Название папки на Яндекс.Диске.
-    :param google_folder_id: ID папки на Google Drive. Только татая реализация .
-                            Как реализовать так же  как для Яндекс.Диска - НЕ РАЗОБРАЛСЯ
-    """
-    vk_connector = VKPhotoBackup(vk_token)
-    photos = vk_connector.get_photos(user_id, album_id, count)
-
-    json_data = []  # Список для сбора информации о фото для JSON файла
-
-    if storage_option == 'yandex':
-        yandex = YandexDiskUploader(ya_token)
-        if not folder_name:
-            folder_name = 'VK_Photos_Backup'
-        yandex.create_folder(folder_name)
-
-        file_name_count = {}
-        for photo in tqdm(photos, desc="Uploading photos to Yandex.Disk"):
-            max_size_photo = max(photo['sizes'], key=lambda size: size['width'] * size['height'])
-            photo_url = max_size_photo['url']
-            likes = photo['likes']['count']
-            if likes not in file_name_count:
-                file_name_count[likes] = 0
-            file_name_count[likes] += 1
-            if file_name_count[likes] == 1:
-                file_name = f"{likes}.jpg"
-            else:
-                file_name = f"{likes}({file_name_count[likes] - 1}).jpg"
-
-            response = requests.get(photo_url)
-            file_path = file_name
-            with open(file_path, 'wb') as file:
-                file.write(response.content)
-            yandex.upload_file(file_path, file_name, folder_name)
-            os.remove(file_path)
-            json_data.append({"file_name": file_name, "size": max_size_photo['type']})
-
-    elif storage_option == 'google':
-        google = GoogleDriveUploader(google_creds_path)
-        for photo in tqdm(photos, desc="Uploading photos to Google Drive"):
-            max_size_photo = max(photo['sizes'], key=lambda size: size['width'] * size['height'])
-            photo_url = max_size_photo['url']
-            likes = photo['likes']['count']
-            file_name = f"{likes}.jpg"
-            response = requests.get(photo_url)
-            file_path = file_name
-            with open(file_path, 'wb') as file:
-                file.write(response.content)
-            google.upload_file(file_path, file_name, google_folder_id)
-            os.remove(file_path)
-            json_data.append({"file_name": file_name, "size": max_size_photo['type']})
-
-    with open('photo_backup_metadata.json', 'w') as json_file:
-        json.dump(json_data, json_file, indent=4)
-    print("Metadata JSON file created as 'photo_backup_metadata.json'")
+    :param folder_name: Название папки на Яндекс.Диске или Google Drive.
+    :param google_folder_id: ID папки на Google Drive. Если не указан, используется
+                             (и при необходимости создается) папка folder_name.
+    :param workers: Максимальное количество одновременно обрабатываемых фотографий.
+    :param session: Общая HTTP-сессия (по умолчанию создается новая).
+    :param manifest_path: Путь к журналу сохраненных фото (None - без журнала).
+    :param dedup: Не загружать повторно фото с одинаковым содержимым.
+    :param server_side: Передавать хранилищу ссылку на фото, чтобы оно скачало его само
+                        (поддерживает Яндекс.Диск). Не сочетается с dedup, так как
+                        содержимое фото нам неизвестно.
+    :param metrics_path: Путь без расширения для файлов метрик .prom и .json (None - не сохранять).
+    :param profile_path: Путь для сохранения профиля cProfile (None - без профилирования).
+                         Профилируются основной поток и обработка каждого фото
+                         (с Python 3.12 - одним общим профилем).
+    :param metadata_path: Путь к файлу JSONL, куда метаданные пишутся по мере обработки фото.
+    :param export_json: Дополнительно сохранить метаданные в прежнем формате
+                        в photo_backup_metadata.json.
+    :param recompress: Перекодировать фото перед загрузкой (нужен Pillow), например
+                       {'image_format': 'WEBP', 'quality': 80, 'max_dimension': 2048}.
+                       Перекодирование идет в пуле процессов; если результат не меньше
+                       исходного файла, загружается оригинал.
+    :param cache_path: Путь к кэшу метаданных VK (None - не использовать кэш).
+    :param cache_ttl: Время жизни записей кэша метаданных в секундах.
+    :return: Итоги копирования: {'photos': ..., 'statuses': {статус: количество}, 'bytes_saved': ...}
+             или None, если ни одно хранилище недоступно.
+    """
+    # Неподдерживаемый формат загрузился бы под именем с чужим расширением
+    if recompress and recompress.get('image_format', 'JPEG').upper() not in RECOMPRESS_EXTENSIONS:
+        raise ValueError(f"Unsupported recompression format: {recompress['image_format']}")
+    profiles = []
+    if profile_path:
+        main_profile = cProfile.Profile()
+        profiles.append(main_profile)
+        main_profile.enable()
+    try:
+        return _run_backup(user_id, vk_token, ya_token, google_creds_path, storage_option, album_id, count, folder_name,
+                    google_folder_id, workers, session, manifest_path, dedup, server_side, metrics_path, profiles,
+                    metadata_path, export_json, recompress, cache_path, cache_ttl)
+    finally:
+        if profile_path:
+            main_profile.disable()
+            pstats.Stats(*profiles).dump_stats(profile_path)
+            print(f"Profile saved as '{profile_path}'")
+
+
+def _profiled(profiles, function, *args):
+    """
+    Вызов function в отдельном профиле cProfile, если профилирование включено.
+
+    До Python 3.12 профиль основного потока не видит рабочие потоки, поэтому
+    каждому вызову нужен свой профиль; позже достаточно профиля основного потока.
+    """
+    if not profiles or PROFILE_ALL_THREADS:
+        return function(*args)
+    profile = cProfile.Profile()
+    profiles.append(profile)
+    return profile.runcall(function, *args)
+
+
+def _run_backup(user_id, vk_token, ya_token, google_creds_path, storage_option, album_id, count, folder_name,
+                google_folder_id, workers, session, manifest_path, dedup, server_side, metrics_path, profiles,
+                metadata_path, export_json, recompress, cache_path, cache_ttl):
+    session = session or RateLimitedSession(pool_size=max(10, workers))
+    folder_name = folder_name or 'VK_Photos_Backup'
+    targets = []
+    for backend in _storage_backends(storage_option, ya_token, google_creds_path, session):
+        if backend.name == 'google' and google_folder_id:
+            folder = google_folder_id
+        else:
+            folder = backend.prepare_folder(folder_name)
+        if folder is None:
+            print(f"Skipping {backend.title}: folder '{folder_name}' is not available.")
+            continue
+        targets.append({'backend': backend, 'folder': folder, 'destination': f"{backend.name}:{folder}"})
+    if not targets:
+        return
+
+    cache = VKMetadataCache(cache_path, cache_ttl) if cache_path else None
+    try:
+        photos = VKPhotoBackup(vk_token, session, cache).get_photos(user_id, album_id, count)
+    finally:
+        if cache is not None:
+            cache.close()
+    file_names = {
+        target['destination']: _photo_file_names(photos, target['backend'].unique_names) for target in targets
+    }
+    description = "Uploading photos to " + ", ".join(target['backend'].title for target in targets)
+
+    manifest = BackupManifest(manifest_path) if manifest_path else None
+    metadata = MetadataWriter(metadata_path)
+    bytes_saved = 0
+    statuses = Counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor, \
+                ThreadPoolExecutor(max_workers=max(1, workers) * len(targets)) as upload_executor, \
+                (ProcessPoolExecutor() if recompress else nullcontext()) as transform_executor, \
+                tqdm(total=len(photos), desc=description) as progress:
+            futures = {}
+            for index, photo in enumerate(photos):
+                photo_targets = [dict(target, file_name=file_names[target['destination']][index])
+                                 for target in targets]
+                futures[executor.submit(_profiled, profiles, _backup_photo, session, photo, photo_targets,
+                                        upload_executor, manifest, dedup,
+                                        server_side and not (dedup or recompress), recompress,
+                                        transform_executor)] = index
+            for future in as_completed(futures):
+                # Фото завершаются в произвольном порядке; номер в альбоме нужен для экспорта в JSON
+                record = dict(future.result(), index=futures[future])
+                bytes_saved += record.get('bytes_saved', 0)
+                statuses.update(result['status'] for result in record['destinations'].values())
+                metadata.write(record)
+                progress.update(1)
+    finally:
+        metadata.close()
+        if manifest is not None:
+            manifest.close()
+
+    if recompress:
+        print(f"Recompression saved {bytes_saved} bytes")
+    print(f"Metadata JSONL file created as '{metadata_path}'")
+    if export_json:
+        export_metadata_json(metadata_path)
+        print("Metadata JSON file created as 'photo_backup_metadata.json'")
+    if metrics_path:
+        session.metrics.export(metrics_path)
+        print(f"Metrics saved as '{metrics_path}.prom' and '{metrics_path}.json'")
+    return {'photos': len(photos), 'statuses': dict(statuses), 'bytes_saved': bytes_saved}
+
+
+def read_backup_jobs(path):
+    """
+    Чтение списка заданий для массового копирования из файла JSONL или CSV.
+
+    Поля задания: user_id, album_ids (список или ID через ';' в CSV), storage
+    (yandex/google/both) и необязательные count, folder_name, vk_token, ya_token.
+    Фото каждого альбома сохраняются в подпапку folder_name/<user_id>_<album_id>.
+
+    :param path: Путь к файлу заданий (.jsonl или .csv).
+    :return: Список заданий в виде словарей.
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.csv'):
+            rows = [row for row in csv.DictReader(file)]
+            for row in rows:
+                row['album_ids'] = [album_id for album_id in row.get('album_ids', '').split(';') if album_id]
+        else:
+            rows = [json.loads(line) for line in file if line.strip()]
+    jobs = []
+    for row in rows:
+        count = row.get('count')
+        jobs.append({
+            'user_id': row['user_id'],
+            'album_ids': row['album_ids'] if isinstance(row['album_ids'], list) else [row['album_ids']],
+            'storage': row.get('storage') or 'yandex',
+            'count': int(count) if count else 5,
+            'folder_name': row.get('folder_name') or 'VK_Photos_Backup',
+            'vk_token': row.get('vk_token') or VK_TOKEN,
+            'ya_token': row.get('ya_token') or YA_TOKEN,
+        })
+    return jobs
+
+
+def _fair_order(jobs):
+    """
+    Разбиение заданий на задачи по одному альбому в порядке round-robin.
+
+    Первыми идут первые альбомы всех пользователей, затем вторые и так далее,
+    поэтому аккаунт с сотнями альбомов не задерживает небольшие аккаунты.
+    """
+    tasks = []
+    for round_index in range(max((len(job['album_ids']) for job in jobs), default=0)):
+        for job in jobs:
+            if round_index < len(job['album_ids']):
+                tasks.append(dict(job, album_id=job['album_ids'][round_index]))
+    return tasks
+
+
+# Состояние процесса массового копирования: общий ограничитель и сессии по токенам
+_bulk_state = {}
+
+
+def _bulk_worker_init(global_rate, token_rate, workers):
+    """
+    Подготовка процесса массового копирования.
+
+    :param global_rate: Доля общего лимита запросов к API VK для этого процесса.
+    :param token_rate: Доля лимита запросов на один токен VK для этого процесса.
+    :param workers: Количество параллельных загрузок в одной задаче.
+    """
+    _bulk_state['budget'] = TokenBucket(global_rate) if global_rate else None
+    _bulk_state['token_rate'] = token_rate
+    _bulk_state['workers'] = workers
+    _bulk_state['sessions'] = {}
+
+
+def _bulk_session(vk_token):
+    """
+    Сессия с лимитом запросов для токена VK, общая для задач процесса.
+    """
+    sessions = _bulk_state['sessions']
+    if vk_token not in sessions:
+        host = urlsplit(VK_API_URL).hostname
+        sessions[vk_token] = RateLimitedSession(rate_limits={host: _bulk_state['token_rate']},
+                                                pool_size=max(10, _bulk_state['workers']),
+                                                budget=_bulk_state['budget'])
+    return sessions[vk_token]
+
+
+def _bulk_backup_task(task, output_dir):
+    """
+    Копирование одного альбома в процессе массового копирования.
+
+    Вывод задачи подавляется, чтобы не мешать общему индикатору прогресса.
+
+    :return: Итоги задачи для сводного отчета.
+    """
+    started = time.perf_counter()
+    summary = {'user_id': task['user_id'], 'album_id': task['album_id'], 'storage': task['storage']}
+    name = f"{task['user_id']}_{task['album_id']}"
+    # Имена файлов уникальны только внутри альбома, а загрузка на Яндекс.Диск перезаписывает
+    # файлы, поэтому у каждого альбома своя подпапка
+    folder_name = f"{task['folder_name']}/{name}"
+    summary['folder_name'] = folder_name
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+            result = backup_vk_photos(
+                task['user_id'], task['vk_token'], task['ya_token'], GOOGLE_CREDS_PATH, task['storage'],
+                task['album_id'], task['count'], folder_name, workers=_bulk_state['workers'],
+                session=_bulk_session(task['vk_token']),
+                manifest_path=os.path.join(output_dir, f"{task['user_id']}_manifest.db"),
+                metrics_path=None, metadata_path=os.path.join(output_dir, f"{name}_metadata.jsonl"),
+                export_json=False, cache_path=os.path.join(output_dir, 'vk_metadata_cache.db'))
+        if result is None:
+            summary['error'] = "no storage available"
+        else:
+            summary.update(result)
+    except Exception as error:
+        summary['error'] = repr(error)
+    summary['elapsed'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def bulk_backup(jobs_path, processes=None, workers=4, vk_rate=3, global_rate=None, output_dir='bulk_backup',
+                summary_path='bulk_backup_summary.json'):
+    """
+    Массовое копирование фотографий нескольких пользователей без диалога.
+
+    Задания разбиваются на задачи по одному альбому и выполняются в пуле
+    процессов, внутри каждой задачи фото загружаются параллельно в потоках.
+    Лимиты запросов делятся поровну между процессами.
+
+    :param jobs_path: Путь к файлу заданий (см. read_backup_jobs).
+    :param processes: Количество процессов (по умолчанию по числу ядер).
+    :param workers: Количество параллельных загрузок в одной задаче.
+    :param vk_rate: Лимит запросов к API VK в секунду на один токен.
+    :param global_rate: Общий лимит запросов к API VK в секунду (None - без лимита).
+    :param output_dir: Папка для журналов и метаданных задач.
+    :param summary_path: Путь к файлу сводного отчета JSON.
+    :return: Сводный отчет.
+    """
+    jobs = read_backup_jobs(jobs_path)
+    tasks = _fair_order(jobs)
+    processes = max(1, min(processes or os.cpu_count() or 1, len(tasks) or 1))
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    results = []
+    totals = Counter()
+    with ProcessPoolExecutor(max_workers=processes, initializer=_bulk_worker_init,
+                             initargs=(global_rate / processes if global_rate else None, vk_rate / processes,
+                                       workers)) as executor, \
+            tqdm(total=len(tasks), desc="Backing up albums", unit='album') as progress:
+        futures = [executor.submit(_bulk_backup_task, task, output_dir) for task in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            totals['photos'] += result.get('photos', 0)
+            totals.update(result.get('statuses', {}))
+            totals['errors'] += 'error' in result
+            progress.set_postfix(photos=totals['photos'], failed=totals['failed'], errors=totals['errors'])
+            progress.update(1)
+
+    summary = {
+        'jobs': len(jobs),
+        'tasks': len(tasks),
+        'processes': processes,
+        'elapsed': round(time.perf_counter() - started, 3),
+        'totals': dict(totals),
+        'results': results,
+    }
+    with open(summary_path, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, ensure_ascii=False, indent=4)
+    print(f"Backed up {totals['photos']} photos from {len(tasks)} albums, "
+          f"{totals['errors']} albums failed. Summary saved as '{summary_path}'")
+    return summary
 
 
 if __name__ == "__main__":
-    user_id = input("Enter VK user ID: ")
-    vk_backup = VKPhotoBackup(VK_TOKEN)
-    print("Available albums:")
-    albums = vk_backup.get_albums(user_id)
-
-    album_id = input("Enter album ID for backup: ")
-    count = input("Enter the number of photos to download (default 5): ")
-    count = int(count) if count.isdigit() else 5
-
-    storage_option = input("Choose storage (yandex/google): ").strip().lower()
-    folder_name = input(
-        "Enter Yandex Disk folder name (default VK_Photos_Backup): ") if storage_option == 'yandex' else None
-    google_folder_id = input("Enter Google Drive folder ID: ") if storage_option == 'google' else None
-
-    backup_vk_photos(user_id, VK_TOKEN, YA_TOKEN, GOOGLE_CREDS_PATH, storage_option, album_id, count, folder_name,
-                     google_folder_id)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Backup VK photos to Yandex.Disk and Google Drive")
+    parser.add_argument('--jobs', help="JSONL or CSV job list for non-interactive bulk backup")
+    parser.add_argument('--processes', type=int, help="worker processes for bulk backup")
+    parser.add_argument('--workers', type=int, default=4, help="parallel uploads per album in bulk backup")
+    parser.add_argument('--vk-rate', type=float, default=3, help="VK API requests per second per token")
+    parser.add_argument('--global-rate', type=float, help="VK API requests per second across all tokens")
+    parser.add_argument('--output-dir', default='bulk_backup', help="directory for bulk backup manifests")
+    parser.add_argument('--summary', default='bulk_backup_summary.json', help="bulk backup summary file")
+    args = parser.parse_args()
+
+    if args.jobs:
+        bulk_backup(args.jobs, args.processes, args.workers, args.vk_rate, args.global_rate, args.output_dir,
+                    args.summary)
+    else:
+        user_id = input("Enter VK user ID: ")
+        vk_backup = VKPhotoBackup(VK_TOKEN, cache=VKMetadataCache())
+        print("Available albums:")
+        albums = vk_backup.get_albums(user_id)
+
+        album_id = input("Enter album ID for backup: ")
+        count = input("Enter the number of photos to download (default 5): ")
+        count = int(count) if count.isdigit() else 5
+
+        storage_option = input("Choose storage (yandex/google/both): ").strip().lower()
+        google_folder_id = input(
+            "Enter Google Drive folder ID (leave empty to use a folder by name): ") if storage_option in (
+            'google', 'both') else None
+        folder_name = input("Enter folder name (default VK_Photos_Backup): ")
+        workers = input("Enter the number of parallel uploads (default 4): ")
+        workers = int(workers) if workers.isdigit() else 4
+        while True:
+            image_format = input("Recompress photos before upload (jpeg/webp, leave empty to keep originals): ")
+            image_format = image_format.strip().upper()
+            if not image_format or image_format in RECOMPRESS_EXTENSIONS:
+                break
+            print(f"Unsupported format: {image_format}")
+        recompress = {'image_format': image_format} if image_format else None
+
+        backup_vk_photos(user_id, VK_TOKEN, YA_TOKEN, GOOGLE_CREDS_PATH, storage_option, album_id, count, folder_name,
+                         google_folder_id, workers, recompress=recompress)
\ No newline at end of file
@@ -0,0 +1,500 @@
+"""
+Замер пропускной способности backup_vk_photos без обращения к настоящим API.
+
+Скрипт поднимает локальные заглушки VK (photos.get, photos.getAlbums),
+Яндекс.Диска (resources, resources/upload) и Google Drive (resumable-загрузка),
+прогоняет резервное копирование для нескольких уровней параллельности
+и дописывает результаты в benchmark_results.jsonl, чтобы их можно было
+сравнивать между запусками.
+
+Для прогона с Google Drive нужен пакет cryptography (он есть в requirements.txt).
+Пиковая память берется из resource (Linux, macOS), а на Windows - из psutil,
+если он установлен; иначе она не сообщается.
+
+С ключом --bulk-processes вместо замера проверяется массовое копирование
+(bulk_backup) в нескольких процессах.
+
+Пример запуска:
+    python benchmark.py --photos 200 --photo-size 500000 --latency 0.05 --concurrency 1 4 16
+    python benchmark.py --bulk-processes 4
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from queue import Empty
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    import resource
+except ImportError:
+    # Модуля resource нет в Windows
+    resource = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(SCRIPT_DIR, 'benchmark_results.jsonl')
+SEND_CHUNK_SIZE = 64 * 1024
+# Как часто проверять, жив ли процесс прогона, пока он не вернул результат (секунды)
+RESULT_POLL_INTERVAL = 1
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик запросов заглушек VK, Яндекс.Диска и Google Drive.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _throttle(self, size):
+        if self.config['bandwidth']:
+            time.sleep(size / self.config['bandwidth'])
+
+    def _failed(self):
+        return random.random() < self.config['error_rate']
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        for start in range(0, len(body), SEND_CHUNK_SIZE):
+            chunk = body[start:start + SEND_CHUNK_SIZE]
+            self._throttle(len(chunk))
+            self.wfile.write(chunk)
+
+    def _send_json(self, data, status=200, headers=None):
+        self._send(status, json.dumps(data).encode(), dict(headers or {}, **{'Content-Type': 'application/json'}))
+
+    def _read_body(self):
+        size = 0
+        chunks = []
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                length = int(self.rfile.readline().strip(), 16)
+                if length == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(length))
+                self.rfile.readline()
+                size += length
+                self._throttle(length)
+        else:
+            remaining = int(self.headers.get('Content-Length') or 0)
+            while remaining:
+                chunk = self.rfile.read(min(remaining, SEND_CHUNK_SIZE))
+                chunks.append(chunk)
+                remaining -= len(chunk)
+                size += len(chunk)
+                self._throttle(len(chunk))
+        return b''.join(chunks), size
+
+    def _photo(self, index):
+        return {
+            'id': index,
+            'owner_id': 1,
+            'date': 1600000000 + index,
+            'likes': {'count': index % 50},
+            'sizes': [
+                {'type': 's', 'width': 75, 'height': 75, 'url': f"{self.config['base_url']}/photo/{index}"},
+                {'type': 'w', 'width': 1280 + index % 7, 'height': 1024,
+                 'url': f"{self.config['base_url']}/photo/{index}"},
+            ],
+        }
+
+    def do_GET(self):
+        time.sleep(self.config['latency'])
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        if url.path.startswith('/photo/'):
+            if self._failed():
+                return self._send(500)
+            return self._send(200, self.config['photo_bytes'], {'Content-Type': 'image/jpeg'})
+        if url.path == '/v1/disk/resources/upload':
+            with self.server.lock:
+                self.server.yandex_paths.add(params['path'][0])
+            return self._send_json({'href': f"{self.config['base_url']}/yandex-put/{uuid.uuid4().hex}",
+                                    'method': 'PUT', 'path': params['path'][0]})
+        self._send(404)
+
+    def do_PUT(self):
+        time.sleep(self.config['latency'])
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        if url.path == '/v1/disk/resources':
+            self._read_body()
+            return self._send(201)
+        if url.path.startswith('/yandex-put/'):
+            self._read_body()
+            return self._send(500 if self._failed() else 201)
+        if url.path == '/upload/drive/v3/files' and 'upload_id' in params:
+            return self._drive_chunk(params['upload_id'][0])
+        self._read_body()
+        self._send(404)
+
+    def _drive_chunk(self, upload_id):
+        _, size = self._read_body()
+        uploads = self.server.drive_uploads
+        with self.server.lock:
+            uploads[upload_id] = uploads.get(upload_id, 0) + size
+            received = uploads[upload_id]
+        total = self.headers.get('Content-Range', 'bytes */0').rsplit('/', 1)[-1]
+        if total != '*' and received >= int(total):
+            if self._failed():
+                return self._send(500)
+            return self._send_json({'id': upload_id})
+        self._send(308, headers={'Range': f'bytes=0-{received - 1}'})
+
+    def do_POST(self):
+        time.sleep(self.config['latency'])
+        url = urlsplit(self.path)
+        body, _ = self._read_body()
+        if url.path == '/token':
+            return self._send_json({'access_token': 'benchmark', 'expires_in': 3600, 'token_type': 'Bearer'})
+        if url.path == '/upload/drive/v3/files':
+            location = (f"{self.config['base_url']}/upload/drive/v3/files"
+                        f"?uploadType=resumable&upload_id={uuid.uuid4().hex}")
+            return self._send(200, headers={'Location': location})
+        if url.path.startswith('/method/'):
+            if self._failed():
+                return self._send(429)
+            return self._vk_method(url.path[len('/method/'):], parse_qs(body.decode()))
+        self._send(404)
+
+    def _vk_method(self, method, params):
+        if method == 'photos.getAlbums':
+            return self._send_json({'response': {'count': 1, 'items': [
+                {'id': 1, 'title': 'Benchmark', 'size': self.config['photos']}]}})
+        if method == 'photos.get':
+            offset = int(params.get('offset', ['0'])[0])
+            count = int(params.get('count', ['50'])[0])
+            items = [self._photo(index) for index in range(offset, min(offset + count, self.config['photos']))]
+            return self._send_json({'response': {'count': self.config['photos'], 'items': items}})
+        self._send_json({'error': {'error_code': 3, 'error_msg': 'Unknown method passed'}})
+
+
+def start_fake_services(config):
+    """
+    Запуск заглушек в фоновом потоке.
+
+    :param config: Параметры заглушек (photos, photo_size, latency, bandwidth, error_rate).
+    :return: Запущенный сервер; адрес - в server.config['base_url'].
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeApiHandler)
+    server.daemon_threads = True
+    server.config = dict(config, photo_bytes=os.urandom(config['photo_size']),
+                         base_url=f'http://127.0.0.1:{server.server_port}')
+    server.drive_uploads = {}
+    server.yandex_paths = set()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_credentials(path, token_uri):
+    """
+    Создание учетных данных сервисного аккаунта Google с токеном от заглушки.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_key = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()).decode()
+    with open(path, 'w') as credentials_file:
+        json.dump({
+            'type': 'service_account',
+            'project_id': 'benchmark',
+            'private_key_id': 'benchmark',
+            'private_key': private_key,
+            'client_email': 'benchmark@benchmark.iam.gserviceaccount.com',
+            'client_id': '1',
+            'token_uri': token_uri,
+        }, credentials_file)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def _peak_rss_mb():
+    """
+    Пиковая память текущего процесса в МБ или None, если ее не удается узнать.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss в Linux измеряется в КБ, а в macOS - в байтах
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return round(getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024), 1)
+
+
+def _run_level(base_url, credentials_path, storage, photos, workers, results):
+    """
+    Один прогон резервного копирования в отдельном процессе, чтобы пиковая
+    память относилась только к этому прогону.
+    """
+    sys.path.insert(0, SCRIPT_DIR)
+    import Final_version
+
+    Final_version.VK_API_URL = f'{base_url}/method/'
+    Final_version.YANDEX_DISK_API_URL = f'{base_url}/v1/disk/'
+    Final_version.GOOGLE_DRIVE_ROOT_URL = f'{base_url}/'
+
+    latencies = []
+    backup_photo = Final_version._backup_photo
+
+    def timed_backup_photo(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return backup_photo(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    Final_version._backup_photo = timed_backup_photo
+    os.chdir(tempfile.mkdtemp(prefix='vk_backup_benchmark_'))
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+    started = time.perf_counter()
+    try:
+        Final_version.backup_vk_photos(1, 'benchmark', 'benchmark', credentials_path, storage, 1, count=photos,
+                                       workers=workers, google_folder_id='benchmark', manifest_path=None,
+                                       metrics_path=None, cache_path=None)
+    except Exception as error:
+        results.put({'concurrency': workers, 'error': repr(error)})
+        return
+    elapsed = time.perf_counter() - started
+    results.put({
+        'concurrency': workers,
+        'photos': len(latencies),
+        'elapsed_seconds': round(elapsed, 3),
+        'photos_per_second': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_seconds': _percentile(latencies, 0.5),
+        'p99_seconds': _percentile(latencies, 0.99),
+        'peak_rss_mb': _peak_rss_mb(),
+    })
+
+
+def _run_bulk(base_url, jobs_path, processes, vk_rate, work_dir, results):
+    """
+    Массовое копирование в отдельном процессе. Адреса заглушек передаются через
+    переменные окружения, чтобы их получили и процессы bulk_backup.
+    """
+    if hasattr(os, 'setpgrp'):
+        # Своя группа процессов, чтобы при зависании остановить и процессы bulk_backup
+        os.setpgrp()
+    # Лимит bulk_backup действует на хост VK; отдельное имя хоста не дает ему
+    # замедлять загрузки на заглушку Яндекс.Диска, которая слушает тот же адрес
+    os.environ['VK_API_URL'] = f"{base_url.replace('127.0.0.1', 'localhost')}/method/"
+    os.environ['YANDEX_DISK_API_URL'] = f'{base_url}/v1/disk/'
+    os.environ['GOOGLE_DRIVE_ROOT_URL'] = f'{base_url}/'
+    sys.path.insert(0, SCRIPT_DIR)
+    import Final_version
+
+    os.chdir(work_dir)
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+    try:
+        summary = Final_version.bulk_backup(jobs_path, processes, vk_rate=vk_rate,
+                                            output_dir=os.path.join(work_dir, 'bulk_backup'),
+                                            summary_path=os.path.join(work_dir, 'bulk_backup_summary.json'))
+    except Exception as error:
+        results.put({'error': repr(error)})
+        return
+    results.put({'processes': summary['processes'], 'elapsed': summary['elapsed'], 'totals': summary['totals']})
+
+
+def _kill_tree(process):
+    """
+    Остановка процесса вместе с его группой процессов, если он ее возглавляет.
+    """
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+        except OSError:
+            pass
+    process.kill()
+
+
+def _wait_result(process, queue, timeout=None):
+    """
+    Ожидание результата от процесса с проверкой, что процесс еще жив.
+
+    :param timeout: Максимальное время ожидания в секундах (None - без ограничения).
+    :return: Результат или словарь с ключом error, если процесс завершился без
+             результата или не уложился в timeout.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            return queue.get(timeout=RESULT_POLL_INTERVAL)
+        except Empty:
+            if deadline is not None and time.monotonic() > deadline:
+                _kill_tree(process)
+                return {'error': f"no result in {timeout} s"}
+            if process.exitcode is None:
+                continue
+            # Процесс завершился без результата (ошибка импорта, нехватка памяти)
+            try:
+                return queue.get(timeout=RESULT_POLL_INTERVAL)
+            except Empty:
+                return {'error': f"benchmark process exited with code {process.exitcode}"}
+
+
+def run_bulk_check(processes=4, users=4, albums=2, photos=10, vk_rate=3, timeout=300):
+    """
+    Проверка массового копирования (bulk_backup) на заглушках в нескольких процессах.
+
+    Проверяется, что все альбомы копируются за timeout секунд (при vk_rate меньше
+    числа процессов на процесс приходится меньше одного запроса в секунду) и что
+    фото разных альбомов не попадают в одни и те же пути.
+
+    :param processes: Количество процессов bulk_backup.
+    :param users: Количество пользователей в файле заданий.
+    :param albums: Количество альбомов у каждого пользователя.
+    :param photos: Количество фото в альбоме.
+    :param vk_rate: Лимит запросов к API VK в секунду на один токен.
+    :param timeout: Максимальное время проверки в секундах.
+    :return: True, если проверка прошла.
+    """
+    config = {'photos': photos, 'photo_size': 16 * 1024, 'latency': 0, 'bandwidth': 0, 'error_rate': 0.0}
+    server = start_fake_services(config)
+    work_dir = tempfile.mkdtemp(prefix='vk_backup_bulk_check_')
+    jobs_path = os.path.join(work_dir, 'jobs.jsonl')
+    with open(jobs_path, 'w', encoding='utf-8') as jobs_file:
+        for user in range(1, users + 1):
+            jobs_file.write(json.dumps({'user_id': user, 'album_ids': list(range(1, albums + 1)), 'storage': 'yandex',
+                                        'count': photos, 'vk_token': f'benchmark{user}',
+                                        'ya_token': 'benchmark'}) + '\n')
+
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_bulk, args=(server.config['base_url'], jobs_path, processes, vk_rate,
+                                                      work_dir, queue))
+    try:
+        process.start()
+        result = _wait_result(process, queue, timeout)
+        process.join()
+    finally:
+        server.shutdown()
+
+    expected = users * albums * photos
+    if 'error' in result:
+        print(f"bulk_backup with {processes} processes failed: {result['error']}")
+        return False
+    totals = result['totals']
+    passed = (totals.get('uploaded', 0) == expected and not totals.get('errors')
+              and len(server.yandex_paths) == expected)
+    print(f"bulk_backup with {result['processes']} processes: {totals.get('uploaded', 0)}/{expected} photos uploaded "
+          f"to {len(server.yandex_paths)} distinct paths in {result['elapsed']:.1f} s, "
+          f"{totals.get('errors', 0)} albums failed - {'OK' if passed else 'FAILED'}")
+    return passed
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(photos=100, photo_size=300 * 1024, latency=0.02, bandwidth=0, error_rate=0.0,
+                  concurrency=(1, 4, 16), storage='yandex', output=RESULTS_PATH):
+    """
+    Прогон резервного копирования на заглушках для каждого уровня параллельности.
+
+    :param photos: Количество фотографий в альбоме.
+    :param photo_size: Размер одной фотографии в байтах.
+    :param latency: Задержка ответа заглушек в секундах.
+    :param bandwidth: Скорость передачи на одно соединение в байтах/с (0 - без ограничения).
+    :param error_rate: Доля ответов с ошибкой (от 0 до 1).
+    :param concurrency: Уровни параллельности (значения workers).
+    :param storage: Хранилище ('yandex', 'google' или 'both').
+    :param output: Файл, в который дописываются результаты (None - не сохранять).
+    :return: Запись с параметрами и результатами прогона.
+    """
+    config = {'photos': photos, 'photo_size': photo_size, 'latency': latency, 'bandwidth': bandwidth,
+              'error_rate': error_rate}
+    server = start_fake_services(config)
+    base_url = server.config['base_url']
+    credentials_path = None
+    if storage in ('google', 'both'):
+        credentials_path = os.path.join(tempfile.mkdtemp(prefix='vk_backup_benchmark_'), 'credentials.json')
+        write_credentials(credentials_path, f'{base_url}/token')
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    try:
+        for workers in concurrency:
+            queue = context.Queue()
+            process = context.Process(target=_run_level,
+                                      args=(base_url, credentials_path, storage, photos, workers, queue))
+            process.start()
+            result = dict({'concurrency': workers}, **_wait_result(process, queue))
+            process.join()
+            results.append(result)
+            if 'error' in result:
+                print(f"workers={result['concurrency']:>3}  failed: {result['error']}")
+                continue
+            print(f"workers={result['concurrency']:>3}  {result['photos_per_second']:>8} photos/s  "
+                  f"p50={result['p50_seconds']:.3f}s  p99={result['p99_seconds']:.3f}s  "
+                  f"peak RSS={result['peak_rss_mb'] if result['peak_rss_mb'] is not None else 'n/a'} MB")
+    finally:
+        server.shutdown()
+
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'storage': storage,
+        'config': config,
+        'results': results,
+    }
+    if output:
+        with open(output, 'a') as output_file:
+            output_file.write(json.dumps(record) + '\n')
+        print(f"Results appended to '{output}'")
+    return record
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for backup_vk_photos")
+    parser.add_argument('--photos', type=int, default=100, help="photos in the fake album")
+    parser.add_argument('--photo-size', type=int, default=300 * 1024, help="size of each photo in bytes")
+    parser.add_argument('--latency', type=float, default=0.02, help="fake API response latency in seconds")
+    parser.add_argument('--bandwidth', type=int, default=0, help="bytes/s per connection, 0 for unlimited")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of failed responses (0..1)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help="workers to test")
+    parser.add_argument('--storage', choices=['yandex', 'google', 'both'], default='yandex')
+    parser.add_argument('--output', default=RESULTS_PATH, help="JSONL file to append results to")
+    parser.add_argument('--bulk-processes', type=int,
+                        help="instead of the throughput benchmark, check bulk_backup with this many processes")
+    args = parser.parse_args()
+
+    if args.bulk_processes:
+        sys.exit(0 if run_bulk_check(args.bulk_processes) else 1)
+    run_benchmark(args.photos, args.photo_size, args.latency, args.bandwidth, args.error_rate,
+                  args.concurrency, args.storage, args.output)
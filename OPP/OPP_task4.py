@@ -1,4 +1,325 @@
+import csv
+import json
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import deque
+from collections.abc import MutableMapping
+from itertools import count, islice
+
+# Блокировки оценок общие для групп участников: участник получает одну из них по кругу,
+# поэтому оценки разных участников обычно ставятся параллельно без отдельной блокировки на каждого
+GRADE_LOCK_STRIPES = 64
+grade_locks = [threading.RLock() for _ in range(GRADE_LOCK_STRIPES)]
+grade_lock_numbers = count()
+# Сколько изменений копится в очереди CourseRegistry, прежде чем оценивающий поток применит их сам
+REGISTRY_UPDATE_BATCH = 1024
+
+
+class CourseGrades(tuple):
+    # Оценки курса только для чтения: append и изменение на месте вызывают ошибку, а не теряются.
+    # grades[course] += [оценка] по-прежнему работает: сложение дает список, который
+    # присваивается обратно через GradeStore.__setitem__. Сравнение со списком - как у списка
+    __slots__ = ()
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            return list(self) == other
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+
+class GradeStore(MutableMapping):
+    # Оценки курса хранятся в array('b') по байту на оценку, суммы и количества
+    # обновляются при добавлении, поэтому средние считаются за O(1).
+    # registry и owner заполняет CourseRegistry, чтобы получать изменения оценок.
+    # Изменения идут под блокировкой участника и только ставятся в очередь CourseRegistry,
+    # блокировку рейтинга оценивающие потоки не ждут
+    __slots__ = ('_grades', '_totals', 'total', 'count', 'registry', 'owner', 'lock')
+
+    def __init__(self, grades=None):
+        self.lock = grade_locks[next(grade_lock_numbers) % GRADE_LOCK_STRIPES]
+        self._grades = {}
+        self._totals = {}
+        self.total = 0
+        self.count = 0
+        self.registry = None
+        self.owner = None
+        if grades:
+            self.update(grades)
+
+    def add(self, course, grade):
+        with self.lock:
+            if course in self._grades:
+                self._grades[course].append(grade)
+                self._totals[course] += grade
+            else:
+                self._grades[course] = array('b', [grade])
+                self._totals[course] = grade
+            self.total += grade
+            self.count += 1
+            registry = self.registry
+            if registry is not None:
+                registry.update(self.owner, course, grade, 1)
+        if registry is not None:
+            registry.apply_updates(REGISTRY_UPDATE_BATCH, blocking=False)
+
+    def extend(self, course, grades):
+        grades = array('b', grades)
+        if not grades:
+            return
+        total = sum(grades)
+        with self.lock:
+            if course in self._grades:
+                self._grades[course].extend(grades)
+                self._totals[course] += total
+            else:
+                self._grades[course] = grades
+                self._totals[course] = total
+            self.total += total
+            self.count += len(grades)
+            registry = self.registry
+            if registry is not None:
+                registry.update(self.owner, course, total, len(grades))
+        if registry is not None:
+            registry.apply_updates(REGISTRY_UPDATE_BATCH, blocking=False)
+
+    def course_total(self, course):
+        return self._totals.get(course, 0)
+
+    def course_count(self, course):
+        return len(self._grades.get(course, ()))
+
+    def average(self):
+        with self.lock:
+            return self.total / self.count if self.count > 0 else 0
+
+    def __getitem__(self, course):
+        # Оценки меняются только через add/extend, присваивание или grades[course] += [...]
+        return CourseGrades(self._grades[course])
+
+    def __setitem__(self, course, grades):
+        grades = array('b', grades)
+        with self.lock:
+            if course in self._grades:
+                del self[course]
+            self._grades[course] = grades
+            self._totals[course] = sum(grades)
+            self.total += self._totals[course]
+            self.count += len(grades)
+            if self.registry is not None:
+                self.registry.update(self.owner, course, self._totals[course], len(grades))
+
+    def __delitem__(self, course):
+        with self.lock:
+            grades = self._grades.pop(course)
+            total = self._totals.pop(course)
+            self.total -= total
+            self.count -= len(grades)
+            if self.registry is not None:
+                self.registry.update(self.owner, course, -total, -len(grades))
+
+    def __iter__(self):
+        return iter(self._grades)
+
+    def __len__(self):
+        return len(self._grades)
+
+    def __repr__(self):
+        grades = {course: list(grades) for course, grades in self._grades.items()}
+        return f"GradeStore({grades!r})"
+
+
+class SortedEntries:
+    # Отсортированный список из блоков ограниченного размера: вставка и удаление
+    # сдвигают элементы только внутри одного блока, а не во всем списке
+    __slots__ = ('_blocks', '_maxes')
+
+    block_size = 512
+
+    def __init__(self):
+        self._blocks = []
+        self._maxes = []
+
+    def add(self, value):
+        if not self._blocks:
+            self._blocks.append([value])
+            self._maxes.append(value)
+            return
+        i = bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            i -= 1
+            self._blocks[i].append(value)
+            self._maxes[i] = value
+        else:
+            insort(self._blocks[i], value)
+        block = self._blocks[i]
+        if len(block) > 2 * self.block_size:
+            self._blocks[i:i + 1] = [block[:self.block_size], block[self.block_size:]]
+            self._maxes[i:i + 1] = [block[self.block_size - 1], block[-1]]
+
+    def remove(self, value):
+        i = bisect_left(self._maxes, value)
+        block = self._blocks[i]
+        del block[bisect_left(block, value)]
+        if block:
+            self._maxes[i] = block[-1]
+        else:
+            del self._blocks[i]
+            del self._maxes[i]
+
+    def count_less(self, value):
+        i = bisect_left(self._maxes, value)
+        count = sum(len(block) for block in self._blocks[:i])
+        if i < len(self._blocks):
+            count += bisect_left(self._blocks[i], value)
+        return count
+
+    def head(self, k):
+        result = []
+        for block in self._blocks:
+            if len(result) >= k:
+                break
+            result.extend(block[:k - len(result)])
+        return result
+
+    def __len__(self):
+        return sum(len(block) for block in self._blocks)
+
+
+class CourseRegistry:
+    # Суммы и количества оценок по курсам и рейтинги: отсортированные списки
+    # (-средняя оценка, номер участника) для каждого курса и для средней по всем курсам (ключ None).
+    # Изменения оценок приходят в очередь _updates без блокировок и применяются пачкой под _lock
+    # перед каждым запросом или когда очередь наберет REGISTRY_UPDATE_BATCH изменений.
+    # Блокировки берутся в порядке _lock, затем блокировка участника
+    __slots__ = ('_keys', '_people', '_totals', '_boards', '_entries', '_next_key', '_lock', '_updates')
+
+    def __init__(self, people=()):
+        self._lock = threading.RLock()
+        self._updates = deque()
+        self._keys = {}
+        self._people = {}
+        self._totals = {}
+        self._boards = {}
+        self._entries = {}
+        self._next_key = 0
+        for person in people:
+            self.register(person)
+
+    def register(self, person):
+        with self._lock:
+            grades = person.grades
+            with grades.lock:
+                # GradeStore сообщает об изменениях только одному рейтингу, второй бы молча устарел
+                if grades.registry not in (None, self):
+                    raise ValueError(f'{person.name} {person.surname} is already in another CourseRegistry')
+                if id(person) in self._keys:
+                    self.unregister(person)
+                key = self._next_key
+                self._next_key += 1
+                self._keys[id(person)] = key
+                self._people[key] = person
+                grades.registry = self
+                grades.owner = person
+                self._place(None, key, grades.average())
+                for course in grades:
+                    self._add_totals(course, grades.course_total(course), grades.course_count(course))
+                    self._place(course, key, grades.course_total(course) / grades.course_count(course))
+
+    def unregister(self, person):
+        with self._lock:
+            grades = person.grades
+            with grades.lock:
+                # Изменения участника уже в очереди: после применения суммы совпадают с его оценками
+                self._apply_updates()
+                key = self._keys.pop(id(person))
+                del self._people[key]
+                grades.registry = None
+                grades.owner = None
+                self._place(None, key, None)
+                for course in grades:
+                    self._add_totals(course, -grades.course_total(course), -grades.course_count(course))
+                    self._place(course, key, None)
+
+    def update(self, person, course, total_delta, count_delta):
+        # Вызывается GradeStore под блокировкой участника
+        self._updates.append((person, course, total_delta, count_delta))
+
+    def apply_updates(self, min_batch=0, blocking=True):
+        if len(self._updates) < min_batch or not self._lock.acquire(blocking):
+            return
+        try:
+            self._apply_updates()
+        finally:
+            self._lock.release()
+
+    def _apply_updates(self):
+        # Суммы курсов меняются на каждое изменение, а место в рейтингах пересчитывается
+        # один раз на участника и курс по текущим оценкам
+        touched = {}
+        while self._updates:
+            person, course, total_delta, count_delta = self._updates.popleft()
+            self._add_totals(course, total_delta, count_delta)
+            touched.setdefault(id(person), (person, set()))[1].add(course)
+        for person, courses in touched.values():
+            key = self._keys[id(person)]
+            grades = person.grades
+            with grades.lock:
+                self._place(None, key, grades.average())
+                for course in courses:
+                    count = grades.course_count(course)
+                    self._place(course, key, grades.course_total(course) / count if count else None)
+
+    def _add_totals(self, course, total_delta, count_delta):
+        totals = self._totals.setdefault(course, [0, 0])
+        totals[0] += total_delta
+        totals[1] += count_delta
+
+    def _place(self, board, key, average):
+        if board not in self._boards:
+            self._boards[board] = SortedEntries()
+        entries = self._boards[board]
+        old_entry = self._entries.pop((board, key), None)
+        if old_entry is not None:
+            entries.remove(old_entry)
+        if average is not None:
+            entry = (-average, key)
+            entries.add(entry)
+            self._entries[(board, key)] = entry
+
+    def course_average(self, course):
+        with self._lock:
+            self._apply_updates()
+            total, count = self._totals.get(course, (0, 0))
+            return total / count if count > 0 else 0
+
+    def top(self, k, course=None):
+        with self._lock:
+            self._apply_updates()
+            if course not in self._boards:
+                return []
+            return [self._people[key] for _, key in self._boards[course].head(k)]
+
+    def rank(self, person, course=None):
+        with self._lock:
+            self._apply_updates()
+            entry = self._entries.get((course, self._keys[id(person)]))
+            if entry is None:
+                return None
+            return self._boards[course].count_less((entry[0],)) + 1
+
+
 class Student:
+    __slots__ = ('name', 'surname', 'gender', 'finished_courses', 'courses_in_progress', '_grades')
+
     def __init__(self, name, surname, gender):
         self.name = name
         self.surname = surname
@@ -7,17 +328,26 @@ class Student:
         self.courses_in_progress = []
         self.grades = {}
 
+    @property
+    def grades(self):
+        return self._grades
+
+    @grades.setter
+    def grades(self, grades):
+        old_grades = getattr(self, '_grades', None)
+        registry = old_grades.registry if old_grades is not None else None
+        if registry is not None:
+            registry.unregister(self)
+        self._grades = GradeStore(grades)
+        if registry is not None:
+            registry.register(self)
+
     def average_grade(self):
-        total_grades = sum([sum(grades) for grades in self.grades.values()], 0)
-        total_count = sum([len(grades) for grades in self.grades.values()], 0)
-        return total_grades / total_count if total_count > 0 else 0
+        return self._grades.average()
 
     def rate_lecturer(self, lecturer, course, grade):
         if isinstance(lecturer, Lecturer) and course in self.courses_in_progress and course in lecturer.courses_attached:
-            if course in lecturer.grades:
-                lecturer.grades[course] += [grade]
-            else:
-                lecturer.grades[course] = [grade]
+            lecturer.grades.add(course, grade)
         else:
             return 'Ошибка'
 
@@ -43,6 +373,8 @@ class Student:
 
 
 class Mentor:
+    __slots__ = ('name', 'surname', 'courses_attached')
+
     def __init__(self, name, surname):
         self.name = name
         self.surname = surname
@@ -50,14 +382,28 @@ class Mentor:
 
 
 class Lecturer(Mentor):
+    __slots__ = ('_grades',)
+
     def __init__(self, name, surname):
         super().__init__(name, surname)
         self.grades = {}
 
+    @property
+    def grades(self):
+        return self._grades
+
+    @grades.setter
+    def grades(self, grades):
+        old_grades = getattr(self, '_grades', None)
+        registry = old_grades.registry if old_grades is not None else None
+        if registry is not None:
+            registry.unregister(self)
+        self._grades = GradeStore(grades)
+        if registry is not None:
+            registry.register(self)
+
     def average_grade(self):
-        total_grades = sum([sum(grades) for grades in self.grades.values()], 0)
-        total_count = sum([len(grades) for grades in self.grades.values()], 0)
-        return total_grades / total_count if total_count > 0 else 0
+        return self._grades.average()
 
     def __str__(self):
         avg_grade = self.average_grade()
@@ -77,12 +423,11 @@ class Lecturer(Mentor):
 
 
 class Reviewer(Mentor):
+    __slots__ = ()
+
     def rate_hw(self, student, course, grade):
         if isinstance(student, Student) and course in self.courses_attached and course in student.courses_in_progress:
-            if course in student.grades:
-                student.grades[course] += [grade]
-            else:
-                student.grades[course] = [grade]
+            student.grades.add(course, grade)
         else:
             return 'Ошибка'
 
@@ -96,9 +441,8 @@ def average_student_grade_for_course(students, course):
     total_grades = 0
     total_count = 0
     for student in students:
-        if course in student.grades:
-            total_grades += sum(student.grades[course])
-            total_count += len(student.grades[course])
+        total_grades += student.grades.course_total(course)
+        total_count += student.grades.course_count(course)
     return total_grades / total_count if total_count > 0 else 0
 
 
@@ -107,57 +451,200 @@ def average_lecturer_grade_for_course(lecturers, course):
     total_grades = 0
     total_count = 0
     for lecturer in lecturers:
-        if course in lecturer.grades:
-            total_grades += sum(lecturer.grades[course])
-            total_count += len(lecturer.grades[course])
+        total_grades += lecturer.grades.course_total(course)
+        total_count += lecturer.grades.course_count(course)
     return total_grades / total_count if total_count > 0 else 0
 
 
-student_1 = Student('Ruoy', 'Eman', 'male')
-student_1.courses_in_progress += ['Python', 'Git']
-student_1.finished_courses += ['Введение в программирование']
-student_1.grades = {'Python': [10, 9, 8], 'Git': [10, 9]}
-
-student_2 = Student('Anna', 'Smith', 'female')
-student_2.courses_in_progress += ['Python']
-student_2.grades = {'Python': [7, 8, 9]}
-
-
-lecturer_1 = Lecturer('Ivan', 'Ivanov')
-lecturer_1.courses_attached += ['Python']
-lecturer_1.grades = {'Python': [10, 9, 8]}
-
-lecturer_2 = Lecturer('Petr', 'Petrov')
-lecturer_2.courses_attached += ['Python']
-lecturer_2.grades = {'Python': [6, 7, 8]}
-
-
-reviewer_1 = Reviewer('Some', 'Buddy')
-reviewer_1.courses_attached += ['Python']
-
-reviewer_2 = Reviewer('John', 'Doe')
-reviewer_2.courses_attached += ['Git']
-
-
-reviewer_1.rate_hw(student_1, 'Python', 10)
-reviewer_2.rate_hw(student_1, 'Git', 9)
-
-
-student_1.rate_lecturer(lecturer_1, 'Python', 10)
-student_2.rate_lecturer(lecturer_1, 'Python', 9)
-student_2.rate_lecturer(lecturer_2, 'Python', 8)
-
-
-print(reviewer_1)
-print()
-print(lecturer_1)
-print()
-print(student_1)
-print()
-
-
-students = [student_1, student_2]
-lecturers = [lecturer_1, lecturer_2]
-
-print(f"Средняя оценка за домашние задания по курсу 'Python': {average_student_grade_for_course(students, 'Python'):.1f}")
-print(f"Средняя оценка за лекции по курсу 'Python': {average_lecturer_grade_for_course(lecturers, 'Python'):.1f}")
+def read_grade_events(path, chunk_size=100000):
+    # События оценок из CSV или JSONL порциями по chunk_size:
+    # kind ('hw' - оценка студенту от проверяющего, 'lecture' - оценка лектору от студента),
+    # rater, target, course, grade
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.csv'):
+            events = csv.DictReader(file)
+        else:
+            events = (json.loads(line) for line in file if line.strip())
+        while True:
+            chunk = list(islice(events, chunk_size))
+            if not chunk:
+                break
+            yield chunk
+
+
+class GradeLoader:
+    # Массовая загрузка оценок: запись на курсы проверяется по множествам пар
+    # (участник, курс), оценки копятся в массивах по группам (вид, участник, курс)
+    def __init__(self, students, lecturers, reviewers):
+        # students, lecturers, reviewers - словари {идентификатор: объект}; идентификаторы
+        # сравниваются как строки, потому что из CSV они приходят строками
+        students = {str(key): student for key, student in students.items()}
+        lecturers = {str(key): lecturer for key, lecturer in lecturers.items()}
+        reviewers = {str(key): reviewer for key, reviewer in reviewers.items()}
+        self.students = students
+        self.lecturers = lecturers
+        self.allowed = {
+            'hw': ({(key, course) for key, reviewer in reviewers.items() for course in reviewer.courses_attached},
+                   {(key, course) for key, student in students.items() for course in student.courses_in_progress}),
+            'lecture': ({(key, course) for key, student in students.items() for course in student.courses_in_progress},
+                        {(key, course) for key, lecturer in lecturers.items() for course in lecturer.courses_attached}),
+        }
+        self.groups = {}
+        self.group_ids = array('l')
+        self.grades = array('b')
+        self.applied = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def add_events(self, events):
+        groups = self.groups
+        group_ids = self.group_ids
+        grades = self.grades
+        for event in events:
+            kind = event['kind']
+            raters, targets = self.allowed.get(kind, ((), ()))
+            course = event['course']
+            if (str(event['rater']), course) not in raters or (str(event['target']), course) not in targets:
+                self.rejected += 1
+                continue
+            group = (kind, str(event['target']), course)
+            if group not in groups:
+                groups[group] = len(groups)
+            group_ids.append(groups[group])
+            grades.append(int(event['grade']))
+            self.accepted += 1
+
+    def load(self, path, chunk_size=100000):
+        for chunk in read_grade_events(path, chunk_size):
+            self.add_events(chunk)
+        return {'accepted': self.accepted, 'rejected': self.rejected}
+
+    def _arrays(self, start=0):
+        import numpy as np
+
+        group_ids = np.frombuffer(self.group_ids, dtype=self.group_ids.typecode)[start:]
+        grades = np.frombuffer(self.grades, dtype=np.int8)[start:]
+        return group_ids, grades
+
+    def _sorted(self, start=0):
+        # Оценки, отсортированные по группе и значению, начало и размер каждой группы
+        import numpy as np
+
+        group_ids, grades = self._arrays(start)
+        order = np.lexsort((grades, group_ids))
+        group_ids = group_ids[order]
+        grades = grades[order]
+        starts = np.searchsorted(group_ids, np.arange(len(self.groups)))
+        counts = np.diff(np.append(starts, len(group_ids)))
+        return grades, starts, counts
+
+    def apply(self):
+        # Еще не добавленные оценки каждой группы попадают в GradeStore одним вызовом
+        grades, starts, counts = self._sorted(self.applied)
+        people = {'hw': self.students, 'lecture': self.lecturers}
+        for (kind, key, course), start, count in zip(self.groups, starts.tolist(), counts.tolist()):
+            if count:
+                people[kind][key].grades.extend(course, grades[start:start + count].tobytes())
+        self.applied = len(self.grades)
+
+    def group_stats(self, percentiles=(10, 50, 90)):
+        # Среднее, перцентили и гистограмма оценок для каждой группы (вид, участник, курс)
+        import numpy as np
+
+        grades, starts, counts = self._sorted()
+        totals = np.add.reduceat(grades.astype(np.int64), starts) if len(grades) else np.zeros(0, np.int64)
+        means = totals / np.maximum(counts, 1)
+
+        def quantile(q):
+            # Линейная интерполяция, как в numpy.percentile, внутри отсортированной группы
+            exact = starts + (counts - 1) * q / 100
+            lower = np.floor(exact).astype(np.int64)
+            upper = np.minimum(lower + 1, starts + counts - 1)
+            return grades[lower] + (grades[upper] - grades[lower]) * (exact - lower)
+
+        medians = quantile(50)
+        positions = {q: quantile(q) for q in percentiles}
+        group_ids = np.repeat(np.arange(len(counts)), counts)
+        width = int(grades.max()) + 1 if len(grades) else 1
+        histograms = np.bincount(group_ids * width + grades, minlength=len(counts) * width).reshape(-1, width)
+        return {
+            group: {
+                'count': int(counts[i]),
+                'mean': float(means[i]),
+                'median': float(medians[i]),
+                **{f'p{q}': float(positions[q][i]) for q in percentiles},
+                'histogram': histograms[i].tolist(),
+            }
+            for i, group in enumerate(self.groups)
+        }
+
+    def cohort_stats(self, kind, course=None, percentiles=(10, 50, 90)):
+        # Статистика по всем оценкам вида kind (и курса course) без разбивки по участникам
+        import numpy as np
+
+        selected = np.array([
+            group_id for (group_kind, _, group_course), group_id in self.groups.items()
+            if group_kind == kind and (course is None or group_course == course)
+        ], dtype=np.int64)
+        group_ids, grades = self._arrays()
+        grades = grades[np.isin(group_ids, selected)]
+        if not len(grades):
+            return {'count': 0}
+        return {
+            'count': int(len(grades)),
+            'mean': float(grades.mean()),
+            'median': float(np.median(grades)),
+            **{f'p{q}': float(value) for q, value in zip(percentiles, np.percentile(grades, percentiles))},
+            'histogram': np.bincount(grades).tolist(),
+        }
+
+
+if __name__ == "__main__":
+    student_1 = Student('Ruoy', 'Eman', 'male')
+    student_1.courses_in_progress += ['Python', 'Git']
+    student_1.finished_courses += ['Введение в программирование']
+    student_1.grades = {'Python': [10, 9, 8], 'Git': [10, 9]}
+
+    student_2 = Student('Anna', 'Smith', 'female')
+    student_2.courses_in_progress += ['Python']
+    student_2.grades = {'Python': [7, 8, 9]}
+
+
+    lecturer_1 = Lecturer('Ivan', 'Ivanov')
+    lecturer_1.courses_attached += ['Python']
+    lecturer_1.grades = {'Python': [10, 9, 8]}
+
+    lecturer_2 = Lecturer('Petr', 'Petrov')
+    lecturer_2.courses_attached += ['Python']
+    lecturer_2.grades = {'Python': [6, 7, 8]}
+
+
+    reviewer_1 = Reviewer('Some', 'Buddy')
+    reviewer_1.courses_attached += ['Python']
+
+    reviewer_2 = Reviewer('John', 'Doe')
+    reviewer_2.courses_attached += ['Git']
+
+
+    reviewer_1.rate_hw(student_1, 'Python', 10)
+    reviewer_2.rate_hw(student_1, 'Git', 9)
+
+
+    student_1.rate_lecturer(lecturer_1, 'Python', 10)
+    student_2.rate_lecturer(lecturer_1, 'Python', 9)
+    student_2.rate_lecturer(lecturer_2, 'Python', 8)
+
+
+    print(reviewer_1)
+    print()
+    print(lecturer_1)
+    print()
+    print(student_1)
+    print()
+
+
+    students = [student_1, student_2]
+    lecturers = [lecturer_1, lecturer_2]
+
+    print(f"Средняя оценка за домашние задания по курсу 'Python': {average_student_grade_for_course(students, 'Python'):.1f}")
+    print(f"Средняя оценка за лекции по курсу 'Python': {average_lecturer_grade_for_course(lecturers, 'Python'):.1f}")
@@ -0,0 +1,105 @@
+import time
+import argparse
+import threading
+from OPP_task4 import Student, Lecturer, Reviewer, CourseRegistry
+
+COURSES = ['Python', 'Git', 'SQL', 'Django']
+
+
+def make_people(people_count):
+    students, lecturers = [], []
+    for number in range(people_count):
+        student = Student(f'Student{number}', 'Test', 'female')
+        student.courses_in_progress += COURSES
+        students.append(student)
+        lecturer = Lecturer(f'Lecturer{number}', 'Test')
+        lecturer.courses_attached += COURSES
+        lecturers.append(lecturer)
+    reviewer = Reviewer('Stress', 'Reviewer')
+    reviewer.courses_attached += COURSES
+    return students, lecturers, reviewer
+
+
+def worker(thread_number, ratings, students, lecturers, reviewer, barrier):
+    # Потоки ставят оценки одним и тем же участникам, чтобы блокировки действительно пересекались
+    barrier.wait()
+    for i in range(thread_number, thread_number + ratings):
+        course = COURSES[i % len(COURSES)]
+        grade = i % 10 + 1
+        student = students[i % len(students)]
+        reviewer.rate_hw(student, course, grade)
+        student.rate_lecturer(lecturers[(i * 7) % len(lecturers)], course, grade)
+
+
+def expected_totals(threads, ratings):
+    totals = {}
+    for thread_number in range(threads):
+        for i in range(thread_number, thread_number + ratings):
+            course = COURSES[i % len(COURSES)]
+            total, count = totals.get(course, (0, 0))
+            totals[course] = (total + i % 10 + 1, count + 1)
+    return totals
+
+
+def check(people, registry, expected):
+    # Суммы и количества должны сойтись с массивами оценок, с CourseRegistry и с ожидаемыми
+    totals = {}
+    for person in people:
+        grades = person.grades
+        assert grades.total == sum(sum(course_grades) for course_grades in grades.values())
+        assert grades.count == sum(len(course_grades) for course_grades in grades.values())
+        for course, course_grades in grades.items():
+            assert grades.course_total(course) == sum(course_grades)
+            total, count = totals.get(course, (0, 0))
+            totals[course] = (total + sum(course_grades), count + len(course_grades))
+    assert totals == expected, (totals, expected)
+    if registry is None:
+        return
+    for course, (total, count) in expected.items():
+        assert registry.course_average(course) == total / count
+    assert len(registry.top(len(people))) == len(people)
+    for person in people:
+        for course in person.grades:
+            rank = registry.rank(person, course)
+            better = [other for other in people if course in other.grades
+                      and other.grades.course_total(course) / other.grades.course_count(course)
+                      > person.grades.course_total(course) / person.grades.course_count(course)]
+            assert rank == len(better) + 1, (rank, len(better))
+
+
+def run(threads, ratings, people_count, with_registry):
+    # with_registry=False меряет только блокировки участников, True - вместе с очередью CourseRegistry
+    students, lecturers, reviewer = make_people(people_count)
+    student_registry = CourseRegistry(students) if with_registry else None
+    lecturer_registry = CourseRegistry(lecturers) if with_registry else None
+    barrier = threading.Barrier(threads + 1)
+    workers = [threading.Thread(target=worker, args=(number, ratings, students, lecturers, reviewer, barrier))
+               for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    expected = expected_totals(threads, ratings)
+    check(students, student_registry, expected)
+    check(lecturers, lecturer_registry, expected)
+    return 2 * threads * ratings / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent rate_hw/rate_lecturer stress test')
+    parser.add_argument('--threads', default='1,2,4,8', help='comma-separated thread counts')
+    parser.add_argument('--ratings', type=int, default=50000, help='rate_hw + rate_lecturer pairs per thread')
+    parser.add_argument('--people', type=int, default=200, help='students and lecturers in each registry')
+    args = parser.parse_args()
+
+    for with_registry in (False, True):
+        print('With CourseRegistry' if with_registry else 'Without CourseRegistry')
+        baseline = None
+        for threads in map(int, args.threads.split(',')):
+            rate = run(threads, args.ratings, args.people, with_registry)
+            baseline = baseline or rate
+            print(f'  {threads} threads: {rate:,.0f} ratings/s ({rate / baseline:.2f}x), totals consistent')
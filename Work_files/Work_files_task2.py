@@ -1,36 +1,9 @@
 from  pprint import pprint
-def parse_recipes(filename):
-    cook_book = {}
+from cook_book import load_cook_book, ShopListEngine
 
-    with open(filename, 'r', encoding='utf-8') as file:
-        while True:
-
-            dish_name = file.readline().strip()
-            if not dish_name:
-                break
-
-            num_of_ingredients = int(file.readline().strip())
-
-            ingredients = []
-
-            for _ in range(num_of_ingredients):
-                ingredient_data = file.readline().strip().split(' | ')
-                ingredient_name = ingredient_data[0]
-                quantity = int(ingredient_data[1])
-                measure = ingredient_data[2]
-                ingredients.append({
-                    'ingredient_name': ingredient_name,
-                    'quantity': quantity,
-                    'measure': measure
-                })
-
-            cook_book[dish_name] = ingredients
-
-            file.readline()
-    return cook_book
 
 filename = 'recipes.txt'
-cook_book = parse_recipes(filename)
+cook_book = load_cook_book(filename)
 
 
 def get_shop_list_by_dishes(dishes, person_count):
@@ -50,4 +23,14 @@ def get_shop_list_by_dishes(dishes, person_count):
 
     return shop_list
 
+
+shop_list_engine = None
+
+
+def get_shop_lists(orders):
+    global shop_list_engine
+    if shop_list_engine is None:
+        shop_list_engine = ShopListEngine(cook_book)
+    return shop_list_engine.shop_lists(orders)
+
 pprint(get_shop_list_by_dishes(['Запеченный картофель', 'Омлет'], 2))
@@ -1,22 +1,152 @@
 import os
+import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
-def combine_files(file_list, output_file):
+READ_BUFFER_SIZE = 1024 * 1024
+# Сколько последних байтов прежнего содержимого сверяется, чтобы убедиться,
+# что файл только дописывался, а не был перезаписан
+TAIL_CHECK_SIZE = 4096
 
-    file_contents = {}
 
-    for file_name in file_list:
+def scan_bytes(f, start):
+    # Возвращает (количество '\n', конец файла, есть ли '\r', последний байт)
+    f.seek(start)
+    newlines = 0
+    size = start
+    last_byte = b''
+    has_carriage_return = False
+    while True:
+        chunk = f.read(READ_BUFFER_SIZE)
+        if not chunk:
+            break
+        newlines += chunk.count(b'\n')
+        size += len(chunk)
+        has_carriage_return = has_carriage_return or b'\r' in chunk
+        last_byte = chunk[-1:]
+    return newlines, size, has_carriage_return, last_byte
+
+
+def tail_crc(f, size):
+    start = max(0, size - TAIL_CHECK_SIZE)
+    f.seek(start)
+    return zlib.crc32(f.read(size - start))
+
+
+def count_lines(file_name, entry=None):
+    # entry - запись индекса с прошлого запуска; возвращается новая запись:
+    # количество строк, размер в байтах, нужен ли текстовый режим и данные для проверки
+    stat = os.stat(file_name)
+    if entry and (entry['inode'], entry['size'], entry['mtime_ns']) == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+        return entry
+
+    with open(file_name, 'rb') as f:
+        start, newlines, last_byte = 0, 0, b''
+        if (entry and not entry['text_mode'] and entry['inode'] == stat.st_ino
+                and 0 < entry['size'] < stat.st_size and tail_crc(f, entry['size']) == entry['tail_crc']):
+            # Файл дописан: считаем только новый хвост
+            start, newlines = entry['size'], entry['newlines']
+            last_byte = b'\n' if entry['trailing_newline'] else b'.'
+        appended_newlines, size, has_carriage_return, appended_last_byte = scan_bytes(f, start)
+        newlines += appended_newlines
+        last_byte = appended_last_byte or last_byte
+        crc = tail_crc(f, size)
+
+    entry = {
+        'inode': stat.st_ino,
+        'size': size,
+        'mtime_ns': stat.st_mtime_ns,
+        'newlines': newlines,
+        'trailing_newline': last_byte == b'\n',
+        'text_mode': has_carriage_return,
+        'tail_crc': crc,
+        'lines': newlines + (last_byte not in (b'', b'\n')),
+    }
+    if has_carriage_return:
+        # readlines считает \r и \r\n переводами строк, такие файлы обрабатываются как текст
         with open(file_name, 'r', encoding='utf-8') as f:
-            content = f.readlines()
-            file_contents[file_name] = content
+            entry['lines'] = sum(1 for _ in f)
+    return entry
+
+
+def load_index(index_file):
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_index(index_file, index):
+    temp_file = f'{index_file}.{os.getpid()}.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(temp_file, index_file)
+
+
+def copy_bytes(output, file_name, size):
+    # Копирование в ядре без чтения файла в память процесса, если ОС это умеет
+    copied = 0
+    with open(file_name, 'rb') as source:
+        try:
+            if hasattr(os, 'copy_file_range'):
+                while copied < size:
+                    sent = os.copy_file_range(source.fileno(), output.fileno(), size - copied, copied)
+                    if not sent:
+                        break
+                    copied += sent
+            elif hasattr(os, 'sendfile'):
+                while copied < size:
+                    sent = os.sendfile(output.fileno(), source.fileno(), copied, size - copied)
+                    if not sent:
+                        break
+                    copied += sent
+        except OSError:
+            pass
+
+        source.seek(copied)
+        while copied < size:
+            chunk = source.read(min(READ_BUFFER_SIZE, size - copied))
+            if not chunk:
+                break
+            output.write(chunk)
+            copied += len(chunk)
+
+
+def copy_text(output, file_name):
+    with open(file_name, 'r', encoding='utf-8') as f:
+        for line in f:
+            output.write(line.replace('\n', os.linesep).encode('utf-8'))
+
+
+def combine_files(file_list, output_file, index_file=None):
+
+    file_names = list(dict.fromkeys(file_list))
+
+    # Индекс строк хранится рядом с результатом; неизменившиеся файлы не перечитываются
+    index_file = index_file or f'{output_file}.index.json'
+    index = load_index(index_file)
+    paths = [os.path.abspath(file_name) for file_name in file_names]
+    with ThreadPoolExecutor() as executor:
+        entries = list(executor.map(count_lines, file_names, [index.get(path) for path in paths]))
+    index.update(zip(paths, entries))
+    save_index(index_file, index)
+    counts = dict(zip(file_names, entries))
 
-    sorted_files = sorted(file_contents.items(), key=lambda item: len(item[1]))
+    sorted_files = sorted(file_names, key=lambda file_name: counts[file_name]['lines'])
 
-    with open(output_file, 'w', encoding='utf-8') as output:
-        for file_name, content in sorted_files:
-            output.write(f"{file_name}\n")
-            output.write(f"{len(content)}\n")
-            output.writelines(content)
-            output.write("\n")
+    # Без буфера Python: заголовки и содержимое файлов пишутся в один и тот же дескриптор
+    # по очереди; байтовое копирование совпадает с текстовым только при переводе строки '\n'
+    newline = os.linesep
+    with open(output_file, 'wb', buffering=0) as output:
+        for file_name in sorted_files:
+            entry = counts[file_name]
+            output.write(f"{file_name}{newline}{entry['lines']}{newline}".encode('utf-8'))
+            if entry['text_mode'] or newline != '\n':
+                copy_text(output, file_name)
+            else:
+                copy_bytes(output, file_name, entry['size'])
+            output.write(newline.encode('utf-8'))
 
 file_list = ['1.txt', '2.txt', '3.txt']
 output_file = 'result.txt'
@@ -0,0 +1,70 @@
+import os
+import time
+import hashlib
+import argparse
+from cook_book import parse_recipes, parse_recipes_parallel
+
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(value):
+    unit = value[-1].upper()
+    if unit in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[unit])
+    return int(value)
+
+
+def write_synthetic_recipes(filename, size):
+    ingredients = ['Яйцо', 'Молоко', 'Помидор', 'Картофель', 'Чеснок', 'Сыр гауда', 'Утка', 'Мед']
+    measures = ['шт', 'мл', 'г', 'кг', 'зубч', 'ст.л']
+    written = 0
+    dish = 0
+    with open(filename, 'w', encoding='utf-8') as file:
+        while written < size:
+            count = dish % 5 + 1
+            lines = [f'Блюдо {dish}', str(count)]
+            for i in range(count):
+                lines.append(f'{ingredients[(dish + i) % len(ingredients)]} {i} | {(dish * 7 + i) % 500 + 1} | '
+                             f'{measures[(dish + i) % len(measures)]}')
+            record = '\n'.join(lines) + '\n\n'
+            file.write(record)
+            written += len(record.encode('utf-8'))
+            dish += 1
+
+
+def fingerprint(cook_book):
+    # Хеш вместо второго словаря в памяти: на файлах в несколько ГБ два словаря не помещаются
+    digest = hashlib.sha256()
+    for dish_name, ingredients in cook_book.items():
+        digest.update(repr((dish_name, ingredients)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare parse_recipes with parse_recipes_parallel')
+    parser.add_argument('--size', default='2G', help='size of the synthetic file, e.g. 500M or 2G')
+    parser.add_argument('--file', default='synthetic_recipes.txt', help='synthetic file, reused if the size matches')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    size = parse_size(args.size)
+    if not os.path.exists(args.file) or abs(os.path.getsize(args.file) - size) > 1024:
+        print(f'Writing {size} bytes of synthetic recipes to {args.file}')
+        write_synthetic_recipes(args.file, size)
+
+    sequential, sequential_time = timed(parse_recipes, args.file)
+    print(f'parse_recipes: {len(sequential)} dishes in {sequential_time:.2f} s')
+    expected = fingerprint(sequential)
+    del sequential
+    parallel, parallel_time = timed(parse_recipes_parallel, args.file, args.processes)
+    print(f'parse_recipes_parallel: {parallel_time:.2f} s ({sequential_time / parallel_time:.2f}x), '
+          f'same result: {fingerprint(parallel) == expected}')
+    del parallel
+    compact, compact_time = timed(parse_recipes_parallel, args.file, args.processes, compact=True)
+    print(f'parse_recipes_parallel(compact=True): {compact_time:.2f} s ({sequential_time / compact_time:.2f}x)')
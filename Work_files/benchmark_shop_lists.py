@@ -0,0 +1,65 @@
+import os
+import time
+import random
+import argparse
+from cook_book import load_cook_book, ShopListEngine
+from benchmark_parse import parse_size, write_synthetic_recipes
+
+
+def shop_list_by_dishes(cook_book, dishes, person_count):
+    # Тот же цикл, что get_shop_list_by_dishes в Work_files_task2, но с явной книгой рецептов
+    shop_list = {}
+    for dish in dishes:
+        if dish in cook_book:
+            for ingredient in cook_book[dish]:
+                name = ingredient['ingredient_name']
+                quantity = ingredient['quantity'] * person_count
+                measure = ingredient['measure']
+                if name in shop_list:
+                    shop_list[name]['quantity'] += quantity
+                else:
+                    shop_list[name] = {'measure': measure, 'quantity': quantity}
+    return shop_list
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return result, min(times)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare get_shop_list_by_dishes with ShopListEngine.shop_lists')
+    parser.add_argument('--size', default='20M', help='size of the synthetic recipes file, e.g. 20M')
+    parser.add_argument('--file', default='synthetic_recipes.txt', help='synthetic file, reused if the size matches')
+    parser.add_argument('--orders', type=int, default=3000, help='orders per batch')
+    parser.add_argument('--dishes', type=int, nargs='+', default=[3, 50], help='dishes per order to test')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement, the best one is reported')
+    args = parser.parse_args()
+
+    size = parse_size(args.size)
+    if not os.path.exists(args.file) or abs(os.path.getsize(args.file) - size) > 1024:
+        print(f'Writing {size} bytes of synthetic recipes to {args.file}')
+        write_synthetic_recipes(args.file, size)
+
+    cook_book = load_cook_book(args.file)
+    plain_cook_book = dict(cook_book)
+    engine = ShopListEngine(cook_book)
+    dish_names = list(plain_cook_book)
+    random.seed(0)
+    for dishes_per_order in args.dishes:
+        orders = [(random.sample(dish_names, dishes_per_order), random.randint(1, 10)) for _ in range(args.orders)]
+        expected, compiled_time = best_time(
+            lambda: [shop_list_by_dishes(cook_book, dishes, person_count) for dishes, person_count in orders],
+            args.repeat)
+        _, plain_time = best_time(
+            lambda: [shop_list_by_dishes(plain_cook_book, dishes, person_count) for dishes, person_count in orders],
+            args.repeat)
+        result, engine_time = best_time(lambda: engine.shop_lists(orders), args.repeat)
+        same = result == expected and all(list(a) == list(b) for a, b in zip(result, expected))
+        print(f'{args.orders} orders x {dishes_per_order} dishes: loop over load_cook_book {compiled_time:.3f} s, '
+              f'loop over dict {plain_time:.3f} s, ShopListEngine {engine_time:.3f} s '
+              f'({compiled_time / engine_time:.2f}x / {plain_time / engine_time:.2f}x), same result: {same}')
@@ -0,0 +1,436 @@
+import gc
+import os
+import re
+import mmap
+import struct
+import marshal
+from itertools import repeat
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+COMPILED_MAGIC = b'CKBK1'
+# Размер и mtime исходного файла, длина индекса
+COMPILED_HEADER = struct.Struct('<QQQ')
+# Пустая строка между рецептами - граница, по которой файл делится на части
+RECORD_BOUNDARY = re.compile(rb'\n\r?\n')
+PARALLEL_MIN_CHUNK = 4 * 1024 * 1024
+
+
+def parse_recipes(filename):
+    cook_book = {}
+
+    with open(filename, 'r', encoding='utf-8') as file:
+        while True:
+
+            dish_name = file.readline().strip()
+            if not dish_name:
+                break
+
+            num_of_ingredients = int(file.readline().strip())
+
+            ingredients = []
+
+            for _ in range(num_of_ingredients):
+                ingredient_data = file.readline().strip().split(' | ')
+                ingredient_name = ingredient_data[0]
+                quantity = int(ingredient_data[1])
+                measure = ingredient_data[2]
+                ingredients.append({
+                    'ingredient_name': ingredient_name,
+                    'quantity': quantity,
+                    'measure': measure
+                })
+
+            cook_book[dish_name] = ingredients
+
+            file.readline()
+
+    return cook_book
+
+
+def _parse_lines(lines):
+    # Ингредиенты - кортежи (название, количество, единица), а не словари
+    records = []
+    position = 0
+    while position < len(lines):
+        dish_name = lines[position].strip()
+        if not dish_name:
+            position += 1
+            continue
+        num_of_ingredients = int(lines[position + 1].strip())
+        ingredients = []
+        for line in lines[position + 2:position + 2 + num_of_ingredients]:
+            ingredient_data = line.strip().split(' | ')
+            ingredients.append((ingredient_data[0], int(ingredient_data[1]), ingredient_data[2]))
+        records.append((dish_name, tuple(ingredients)))
+        position += 2 + num_of_ingredients
+    return records
+
+
+def _parse_chunk(filename, start, end):
+    # Записи не содержат циклов, поэтому сборщик мусора только тратит время на обход
+    # миллионов кортежей; результат передается обратно в виде marshal - это быстрее pickle
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            lines = data[start:end].decode('utf-8').split('\n')
+        return marshal.dumps(_parse_lines(lines))
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _chunk_bounds(filename, chunks):
+    size = os.path.getsize(filename)
+    if not size:
+        return []
+    chunk_size = max(PARALLEL_MIN_CHUNK, size // chunks + 1)
+    bounds = []
+    start = 0
+    with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        while start < size:
+            match = RECORD_BOUNDARY.search(data, min(start + chunk_size, size))
+            end = match.end() if match else size
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def parse_recipes_parallel(filename, processes=None, compact=False):
+    # compact=True возвращает {блюдо: кортеж кортежей (название, количество, единица)}
+    bounds = _chunk_bounds(filename, (processes or os.cpu_count() or 1) * 4)
+    if len(bounds) <= 1:
+        chunks = [_parse_chunk(filename, start, end) for start, end in bounds]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            chunks = list(executor.map(_parse_chunk, [filename] * len(bounds), *zip(*bounds)))
+    cook_book = {}
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for chunk in chunks:
+            records = marshal.loads(chunk)
+            if compact:
+                cook_book.update(records)
+                continue
+            for dish_name, ingredients in records:
+                cook_book[dish_name] = [
+                    {'ingredient_name': name, 'quantity': quantity, 'measure': measure}
+                    for name, quantity, measure in ingredients
+                ]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return cook_book
+
+
+def compile_cook_book(filename, compiled_filename):
+    # Индекс {блюдо: (смещение, длина)} читается целиком, а ингредиенты
+    # каждого блюда лежат отдельной записью marshal и читаются по запросу
+    stat = os.stat(filename)
+    index = {}
+    records = []
+    offset = 0
+    for dish_name, ingredients in parse_recipes(filename).items():
+        record = marshal.dumps(tuple(
+            (ingredient['ingredient_name'], ingredient['quantity'], ingredient['measure'])
+            for ingredient in ingredients
+        ))
+        index[dish_name] = (offset, len(record))
+        records.append(record)
+        offset += len(record)
+    index_data = marshal.dumps(index)
+
+    temp_filename = f'{compiled_filename}.{os.getpid()}.tmp'
+    with open(temp_filename, 'wb') as file:
+        file.write(COMPILED_MAGIC)
+        file.write(COMPILED_HEADER.pack(stat.st_size, stat.st_mtime_ns, len(index_data)))
+        file.write(index_data)
+        file.writelines(records)
+    os.replace(temp_filename, compiled_filename)
+
+
+class CompiledCookBook(Mapping):
+    def __init__(self, compiled_filename):
+        with open(compiled_filename, 'rb') as file:
+            if file.read(len(COMPILED_MAGIC)) != COMPILED_MAGIC:
+                raise ValueError(f'{compiled_filename} is not a compiled cook book')
+            self.source_size, self.source_mtime_ns, index_length = COMPILED_HEADER.unpack(
+                file.read(COMPILED_HEADER.size))
+            self.index = marshal.loads(file.read(index_length))
+            self.data_offset = file.tell()
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def ingredients(self, dish_name):
+        offset, length = self.index[dish_name]
+        start = self.data_offset + offset
+        return marshal.loads(self.data[start:start + length])
+
+    def __getitem__(self, dish_name):
+        return [
+            {'ingredient_name': name, 'quantity': quantity, 'measure': measure}
+            for name, quantity, measure in self.ingredients(dish_name)
+        ]
+
+    def __contains__(self, dish_name):
+        return dish_name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def is_fresh(self, filename):
+        stat = os.stat(filename)
+        return (stat.st_size, stat.st_mtime_ns) == (self.source_size, self.source_mtime_ns)
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_cook_book(filename, compiled_filename=None):
+    compiled_filename = compiled_filename or filename + '.cookbook'
+    cook_book = None
+    try:
+        cook_book = CompiledCookBook(compiled_filename)
+        if cook_book.is_fresh(filename):
+            return cook_book
+    except (OSError, ValueError, EOFError, struct.error):
+        pass
+    if cook_book is not None:
+        # Устаревший снимок закрывается до перезаписи: в Windows нельзя заменить файл,
+        # отображенный в память
+        cook_book.close()
+    compile_cook_book(filename, compiled_filename)
+    return CompiledCookBook(compiled_filename)
+
+
+class ShopListEngine:
+    # Ингредиенты нумеруются по паре (название, единица), количества блюд хранятся
+    # в виде CSR: ингредиенты блюда i лежат в column_ids[indptr[i]:indptr[i + 1]]
+    def __init__(self, cook_book):
+        import numpy as np
+
+        columns = {}
+        names = {}
+        self.dish_ids = {}
+        indptr = [0]
+        column_ids = []
+        quantities = []
+        for dish_id, (dish_name, ingredients) in enumerate(cook_book.items()):
+            self.dish_ids[dish_name] = dish_id
+            for ingredient in ingredients:
+                key = (ingredient['ingredient_name'], ingredient['measure'])
+                column_ids.append(columns.setdefault(key, len(columns)))
+                names.setdefault(key[0], len(names))
+                quantities.append(ingredient['quantity'])
+            indptr.append(len(column_ids))
+        self.columns = list(columns)
+        self.names = list(names)
+        # Названия и единицы столбцов как массивы объектов: строки результата берутся одной выборкой
+        self.column_ingredients = np.array([name for name, _ in self.columns], dtype=object)
+        self.column_measures = np.array([measure for _, measure in self.columns], dtype=object)
+        self.column_names = np.array([names[name] for name, _ in self.columns], dtype=np.int64)
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.column_ids = np.array(column_ids, dtype=np.int64)
+        self.quantities = np.array(quantities, dtype=np.int64)
+
+    def _positions(self, dish_ids):
+        # Индексы в column_ids для всех ингредиентов блюд подряд
+        import numpy as np
+
+        starts = self.indptr[dish_ids]
+        lengths = self.indptr[dish_ids + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum()), lengths
+
+    def shop_lists(self, orders):
+        # orders - список пар (блюда, количество персон); результат такой же,
+        # как у get_shop_list_by_dishes для каждого заказа. Произведение разреженных
+        # матриц заказ x блюдо и блюдо x ингредиент считается как сумма по группам
+        # (заказ, название ингредиента) для всех ингредиентов всех заказов сразу
+        import numpy as np
+
+        dishes = [dish for order_dishes, _ in orders for dish in order_dishes]
+        dish_ids = np.fromiter(map(self.dish_ids.get, dishes, repeat(-1)), dtype=np.int64, count=len(dishes))
+        dish_rows = np.repeat(np.arange(len(orders)), [len(order_dishes) for order_dishes, _ in orders])
+        known = dish_ids >= 0
+        dish_ids = dish_ids[known]
+        dish_rows = dish_rows[known]
+        if not len(dish_ids):
+            return [{} for _ in orders]
+
+        positions, lengths = self._positions(dish_ids)
+        rows = np.repeat(dish_rows, lengths)
+        columns = self.column_ids[positions]
+        person_counts = np.asarray([person_count for _, person_count in orders])
+        quantities = self.quantities[positions] * person_counts[rows]
+
+        # Количества одного ингредиента в разных единицах складываются, как в get_shop_list_by_dishes,
+        # а единица берется из первого упоминания
+        keys = rows * len(self.names) + self.column_names[columns]
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        totals = np.zeros(len(first), dtype=quantities.dtype)
+        np.add.at(totals, inverse, quantities)
+
+        # Ингредиенты идут по заказам подряд, поэтому сортировка по первому упоминанию
+        # сохраняет и порядок заказов, и порядок ключей внутри заказа
+        order = np.argsort(first)
+        first = first[order]
+        result_columns = columns[first]
+        bounds = np.searchsorted(rows[first], np.arange(len(orders) + 1)).tolist()
+        names = self.column_ingredients[result_columns].tolist()
+        measures = self.column_measures[result_columns].tolist()
+
+        # Время уходит в основном на создание словарей результата; сборщик мусора
+        # на это время отключается, как и при разборе файла
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            entries = [{'measure': measure, 'quantity': quantity}
+                       for measure, quantity in zip(measures, totals[order].tolist())]
+            return [dict(zip(names[start:end], entries[start:end])) for start, end in zip(bounds, bounds[1:])]
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+
+def _bit_positions(mask):
+    # Номера единичных битов за O(длина маски), без отдельной операции на каждый бит
+    bits = bin(mask)[:1:-1]
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+def _mask(positions, size):
+    data = bytearray(size // 8 + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+class CookBookIndex:
+    # Для каждого ингредиента хранится битовая маска блюд (бит i - блюдо с номером i),
+    # для каждого блюда - вектор требований {(название, единица): количество}
+    def __init__(self, cook_book=()):
+        self.dish_ids = {}
+        self.dish_names = []
+        self.requirements = []
+        self.ingredient_names = []
+        self.postings = {}
+        # При начальной загрузке маски собираются один раз из списков номеров:
+        # побитовое ИЛИ с длинным числом на каждое блюдо дало бы квадратичное время
+        positions = {}
+        items = cook_book.items() if isinstance(cook_book, Mapping) else cook_book
+        for dish_name, ingredients in items:
+            self.dish_ids.pop(dish_name, None)
+            dish_id = self._append(dish_name, ingredients)
+            for name in self.ingredient_names[dish_id]:
+                positions.setdefault(name, []).append(dish_id)
+        size = len(self.dish_names)
+        self.all_dishes = _mask(self.dish_ids.values(), size)
+        self.empty_dishes = _mask((dish_id for dish_id in self.dish_ids.values() if not self.requirements[dish_id]),
+                                  size)
+        for name, dish_ids in positions.items():
+            mask = _mask(dish_ids, size) & self.all_dishes
+            if mask:
+                self.postings[name] = mask
+
+    def _append(self, dish_name, ingredients):
+        dish_id = len(self.dish_names)
+        requirements = {}
+        for ingredient in ingredients:
+            key = (ingredient['ingredient_name'], ingredient['measure'])
+            requirements[key] = requirements.get(key, 0) + ingredient['quantity']
+        self.dish_ids[dish_name] = dish_id
+        self.dish_names.append(dish_name)
+        self.requirements.append(requirements)
+        self.ingredient_names.append(frozenset(name for name, _ in requirements))
+        return dish_id
+
+    def add(self, dish_name, ingredients):
+        if dish_name in self.dish_ids:
+            self.remove(dish_name)
+        dish_id = self._append(dish_name, ingredients)
+        bit = 1 << dish_id
+        self.all_dishes |= bit
+        if not self.requirements[dish_id]:
+            self.empty_dishes |= bit
+        for name in self.ingredient_names[dish_id]:
+            self.postings[name] = self.postings.get(name, 0) | bit
+
+    def remove(self, dish_name):
+        # Номер блюда не переиспользуется, чтобы не перестраивать маски
+        dish_id = self.dish_ids.pop(dish_name)
+        bit = 1 << dish_id
+        self.all_dishes &= ~bit
+        self.empty_dishes &= ~bit
+        for name in self.ingredient_names[dish_id]:
+            self.postings[name] &= ~bit
+            if not self.postings[name]:
+                del self.postings[name]
+        self.dish_names[dish_id] = None
+        self.requirements[dish_id] = None
+        self.ingredient_names[dish_id] = None
+
+    def _dishes(self, mask):
+        return [self.dish_names[dish_id] for dish_id in _bit_positions(mask)]
+
+    def dishes_using(self, ingredient_name):
+        return self._dishes(self.postings.get(ingredient_name, 0))
+
+    def _fits(self, requirements, pantry, person_count):
+        for (name, measure), quantity in requirements.items():
+            stock = pantry.get(name)
+            if stock is None or stock['measure'] != measure or stock['quantity'] < quantity * person_count:
+                return False
+        return True
+
+    def cookable(self, pantry, person_count=1):
+        # pantry в формате списка покупок: {название: {'measure': ..., 'quantity': ...}}.
+        # Кандидаты - блюда хотя бы с одним продуктом из кладовой; если их много, сначала
+        # исключаются блюда с продуктами не из кладовой - ИЛИ масок дешевле проверки блюд по одному
+        candidates = self.empty_dishes
+        for name in pantry:
+            candidates |= self.postings.get(name, 0)
+        missing = [mask for name, mask in self.postings.items() if name not in pantry]
+        if len(missing) < candidates.bit_count() // 4:
+            blocked = 0
+            for mask in missing:
+                blocked |= mask
+            candidates &= ~blocked
+        pantry_names = pantry.keys()
+        return [
+            self.dish_names[dish_id] for dish_id in _bit_positions(candidates)
+            if self.ingredient_names[dish_id] <= pantry_names
+            and self._fits(self.requirements[dish_id], pantry, person_count)
+        ]
+
+    def extra_purchases(self, dishes, pantry, person_count=1):
+        # Сколько чего докупить, чтобы приготовить все dishes из продуктов кладовой
+        needed = {}
+        for dish in dishes:
+            if dish in self.dish_ids:
+                for key, quantity in self.requirements[self.dish_ids[dish]].items():
+                    needed[key] = needed.get(key, 0) + quantity * person_count
+        purchases = {}
+        for (name, measure), quantity in needed.items():
+            stock = pantry.get(name)
+            if stock is not None and stock['measure'] == measure:
+                quantity -= stock['quantity']
+            if quantity > 0:
+                if name in purchases:
+                    purchases[name]['quantity'] += quantity
+                else:
+                    purchases[name] = {'measure': measure, 'quantity': quantity}
+        return purchases